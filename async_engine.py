@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+asyncio engine that runs schedule, scores and ESPN postponement jobs together on one event loop.
+
+Each job is a coroutine, so any number of them (from one combined request, or from many requests to a service that
+embeds the scraper) can be in progress on the same loop at once:
+    schedule(date)       - the schedule DataFrame of a date, the same as bbref_scraper.get_schedule
+    scores(date)         - the scores DataFrame of a date, the same as bbref_scraper.get_scores
+    postponements(date)  - the games ESPN lists as postponed from the day before, the same as check_postponements
+    daily(date)          - all three at once: the date's schedule, the day before's scores and the postponements to
+                           the date, as a dictionary of DataFrames
+The pages still come through the response cache and the shared fetcher (http_cache.py, http_session.py), so the
+cache, retries, rate limits and metrics are the same as the blocking functions. Every download the engine starts
+goes through one thread pool of max_connections threads, which is the limit on downloads in flight across every job
+on the loop. Parsing runs in separate threads so it never holds up the loop. A job's box scores are all requested as
+soon as its scores page is read and each one is parsed as soon as it arrives, so a date's scores take about one round
+trip for the page, one for the box scores and the parse time, and daily() takes about as long as the slowest of its
+three jobs rather than all three added together.
+
+Every job can be given a deadline in seconds. A job that runs past it is cancelled and raises asyncio.TimeoutError.
+Cancelling a job (by its deadline, or by cancelling the task running it) drops the downloads it was still waiting for
+a thread for. A download that has already started is let finish in its thread but nothing is done with it.
+"""
+
+import asyncio
+import datetime
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from bbref_scraper import (boxes_index_url, collect_scores, schedule_frame, schedule_table, schedule_url,
+                           scores_game, ScoresStream)
+from espn_postponements import scoreboard_postponements, scoreboard_url
+from game_store import get_game_store
+from http_cache import cached_get
+from metrics import record_stage, timed
+from schedule_index import schedule_index_for
+
+# Maximum number of downloads in flight at once across every job on the engine. Per-site concurrency, rate limiting,
+# timeouts and retries are still handled by the shared fetcher in http_session.
+MAX_CONNECTIONS = 16
+# Number of threads pages are parsed in
+PARSE_THREADS = 4
+
+
+class ScrapeEngine:
+    '''Runs schedule, scores and postponement jobs as coroutines on an asyncio event loop'''
+
+    def __init__(self, max_connections=MAX_CONNECTIONS, parse_threads=PARSE_THREADS):
+        # The engine isn't tied to one event loop, so the same engine can be used by asyncio.run() more than once
+        self.fetch_executor = ThreadPoolExecutor(max_workers=max_connections, thread_name_prefix='engine-fetch')
+        self.parse_executor = ThreadPoolExecutor(max_workers=parse_threads, thread_name_prefix='engine-parse')
+
+    async def fetch(self, url):
+        '''Gets a url through the response cache on one of the engine's download threads'''
+        return await asyncio.get_running_loop().run_in_executor(self.fetch_executor, cached_get, url)
+
+    async def parse(self, function, *args):
+        '''Runs a parsing function on one of the engine's parse threads'''
+        return await asyncio.get_running_loop().run_in_executor(self.parse_executor, function, *args)
+
+    async def run_job(self, name, job, deadline=None):
+        '''Awaits a job's coroutine, cancelling it if it takes longer than deadline seconds, and times it'''
+        start = time.perf_counter()
+        try:
+            if deadline is None:
+                return await job
+            return await asyncio.wait_for(job, deadline)
+        finally:
+            record_stage(name, time.perf_counter() - start, metric='bbref_request_seconds')
+
+    async def schedule(self, day, today=None, use_store=True, deadline=None):
+        '''Returns the schedule DataFrame of a datetime.date, raising ValueError if the date isn't on the schedule'''
+        return await self.run_job('engine_schedule', self.schedule_job(day, today, use_store), deadline)
+
+    async def scores(self, day, use_store=True, deadline=None):
+        '''Returns the scores DataFrame of a datetime.date, sorted by local start time'''
+        return await self.run_job('engine_scores', self.scores_job(day, use_store), deadline)
+
+    async def postponements(self, day, deadline=None):
+        '''Returns the DataFrame (Away, Home) of the games ESPN lists as postponed from the day before to a datetime.date'''
+        return await self.run_job('engine_postponements', self.postponements_job(day), deadline)
+
+    async def daily(self, day=None, today=None, use_store=True, deadline=None):
+        '''Returns a dictionary with a date's schedule, the day before's scores and the postponements to the date'''
+        # The date is today unless given. deadline is applied to each of the three jobs. If any of them fails, the
+        # others are cancelled and the error is raised.
+        today = today or datetime.date.today()
+        day = day or today
+        tasks = {
+            'schedule': asyncio.ensure_future(self.schedule(day, today, use_store, deadline)),
+            'scores': asyncio.ensure_future(self.scores(day - datetime.timedelta(days=1), use_store, deadline)),
+            'postponements': asyncio.ensure_future(self.postponements(day, deadline)),
+        }
+        try:
+            results = await asyncio.gather(*tasks.values())
+        except BaseException:
+            for task in tasks.values():
+                task.cancel()
+            raise
+        return dict(zip(tasks, results))
+
+    async def schedule_job(self, day, today=None, use_store=True):
+        today = today or datetime.date.today()
+        response = await self.fetch(schedule_url(day.year, today))
+
+        def build_frame():
+            with timed('parse_schedule'):
+                schedule = schedule_index_for(response.text)
+            return schedule_frame(schedule_table(schedule, day, today), day, use_store)
+        return await self.parse(build_frame)
+
+    async def scores_job(self, day, use_store=True):
+        # Dates whose scores are complete in the game store are loaded from it, and anything scraped is saved to it,
+        # the same as get_scores
+        if use_store:
+            stored_df = await self.parse(load_stored_scores, day)
+            if stored_df is not None:
+                return stored_df
+        stream = ScoresStream(day)
+        response = await self.fetch(boxes_index_url(day))
+        await self.parse(stream.read_page, response.text)
+        # Every box score is requested at once. Each one is parsed as soon as it's in, while the rest download.
+        games = await asyncio.gather(*(self.box_score(link, game_id) for link, game_id in stream.links.items()))
+        all_games_df = collect_scores(stream, list(games))
+        if use_store:
+            await self.parse(get_game_store().save_scores, all_games_df, day, stream.page_date)
+        return all_games_df
+
+    async def box_score(self, link, game_id):
+        response = await self.fetch(link)
+        return await self.parse(scores_game, response.text, game_id)
+
+    async def postponements_job(self, day):
+        # Postponed games are on the day before's scoreboard, with the date they'll be made up
+        previous_day = day - datetime.timedelta(days=1)
+        response = await self.fetch(scoreboard_url(previous_day))
+        postponements = await self.parse(parse_scoreboard, response.text, previous_day)
+        postponed_df = pd.DataFrame([(game.away, game.home) for game in postponements if game.makeup_date == day],
+                                    columns=['Away', 'Home'])
+        postponed_df.attrs['espn_url'] = scoreboard_url(day)
+        return postponed_df
+
+    def close(self):
+        '''Stops the engine's threads once the downloads and parses they're running are done'''
+        self.fetch_executor.shutdown(cancel_futures=True)
+        self.parse_executor.shutdown(cancel_futures=True)
+
+
+def load_stored_scores(day):
+    with timed('load_stored_scores'):
+        return get_game_store().load_scores(day)
+
+
+def parse_scoreboard(html, day):
+    with timed('parse_espn'):
+        return scoreboard_postponements(html, day)
+
+
+# Shared engine, created the first time it's needed
+engine = None
+engine_lock = threading.Lock()
+
+
+def get_engine():
+    '''Returns the shared ScrapeEngine, creating it on first use'''
+    global engine
+    with engine_lock:
+        if engine is None:
+            engine = ScrapeEngine()
+    return engine
+
+
+def get_daily(day=None, today=None, use_store=True, deadline=None):
+    '''Runs ScrapeEngine.daily on the shared engine from code that isn't already running an event loop'''
+    return asyncio.run(get_engine().daily(day, today, use_store, deadline))
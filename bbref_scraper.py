@@ -0,0 +1,713 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Importable scraping API behind the Baseball Reference Webscraper.
+
+Everything in here takes its inputs as arguments and returns DataFrames, with no GUI, printing or clipboard
+involved, so it can be used from cron jobs, services or other scripts:
+    get_schedule(date)         - the games on BBRef's schedule for a date (of this season or any earlier one)
+    get_schedules(dates)       - the schedules of many dates across any number of seasons, one page load per season
+    get_schedule_changes()     - games added to or taken off BBRef's schedule since it was last checked, by this run
+                                 or an earlier one (the last check is kept in the game store)
+    get_scores(date)           - the inning-by-inning scores of a date's games, sorted by local start time
+    check_postponements(date)  - games from the day before that ESPN lists as rescheduled to the date
+    get_schedule_and_postponements(date) - both of the above, with the BBRef and ESPN pages loaded at the same time
+    get_postponements(start, end) - every game ESPN lists as postponed over a range of dates, with its makeup date
+    get_box_scores(date)       - get_scores plus each game's batting and pitching lines, attendance, venue and duration
+    ScoresStream(date)         - a date's games, yielded one at a time as soon as each box score is in, with
+                                 collect_scores(stream) giving the same DataFrame as get_scores
+    stream_games(start, end)   - every game over a range of dates, one at a time, without keeping them in memory
+    scores_backfill(start, end, output_dir) - resumable scrape of every date's scores in a range, optionally with the
+                                              box scores parsed in a pool of worker processes (parse_workers)
+Each request, page fetch and parse/assembly stage is timed and recorded in metrics.py. Schedules and scores are saved
+to the local game store (game_store.py), and get_scores answers dates that are complete there without scraping.
+Calls made inside an http_cache.fetch_run() block download and parse each page at most once between them.
+"""
+
+import calendar
+import datetime
+import json
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+import pandas as pd
+from bs4 import BeautifulSoup
+from pandas import DataFrame
+
+from box_scores import (games_frame, parse, parse_box_score_content, parse_box_score_record, parse_game,
+                        start_time_number, Game, LinescoreAccumulator)
+from espn_postponements import day_postponements, scan_postponements, scoreboard_url
+from game_store import get_game_store
+from http_cache import cached_get, cached_parse
+from metrics import record_stage, timed, timed_request
+from schedule_index import format_date, schedule_index_for, TODAYS_GAMES
+
+SCHEDULE_URL = 'https://www.baseball-reference.com/leagues/MLB-schedule.shtml'
+# Schedule page of any season, current or past
+SEASON_SCHEDULE_URL = 'https://www.baseball-reference.com/leagues/majors/{year}-schedule.shtml'
+
+# Dictionary of each team's full name and their 3-letter abbreviated name to be used later.
+abbr_dict = {'Boston Red Sox': 'BOS', 'Baltimore Orioles': 'BAL', 'Tampa Bay Rays': 'TBR', 'Toronto Blue Jays': 'TOR',
+             'New York Yankees': 'NYY', 'Chicago White Sox': 'CHW', 'Kansas City Royals': 'KCR',
+             'Detroit Tigers': 'DET', 'Minnesota Twins': 'MIN', 'Cleveland Guardians': 'CLE',
+             'Oakland Athletics': 'OAK', 'Houston Astros': 'HOU', 'Seattle Mariners': 'SEA',
+             'Los Angeles Angels': 'LAA', 'Texas Rangers': 'TEX', 'Atlanta Braves': 'ATL', 'Miami Marlins': 'MIA',
+             'Philadelphia Phillies': 'PHI', 'New York Mets': 'NYM', 'Washington Nationals': 'WAS',
+             'Chicago Cubs': 'CHC', 'St. Louis Cardinals': 'STL', 'Cincinnati Reds': 'CIN', 'Milwaukee Brewers': 'MIL',
+             'Pittsburgh Pirates': 'PIT', 'Los Angeles Dodgers': 'LAD', 'San Diego Padres': 'SDP',
+             'San Francisco Giants': 'SFG', 'Colorado Rockies': 'COL', 'Arizona D\'Backs': 'ARI',
+             'Arizona Diamondbacks': 'ARI'}
+
+# Maximum number of box score pages downloaded at once. Per-site concurrency, rate limiting, timeouts and retries
+# are handled by the shared fetcher in http_session. Setting this to 1 fetches the box scores one after another.
+MAX_FETCH_WORKERS = 8
+# Default number of worker processes the box scores of a backfill are parsed in. 0 parses them in this process.
+PARSE_WORKERS = 0
+# Status text BBRef gives games on the scores page that won't be played on their date
+NOT_PLAYED = re.compile(r'\b(Postponed|Cancell?ed)\b')
+
+
+# Defining of several functions to be used throughout the scraping sections
+# (parse, which turns a list of beautifulsoup strings into Python strings, comes from box_scores.py)
+def box_score_fetcher(links, max_workers=MAX_FETCH_WORKERS):
+    '''Fetches all the box score links concurrently and returns the responses in the same order as the links'''
+    # Fetches one after another if only one worker is wanted (or there's only one game)
+    if max_workers <= 1 or len(links) <= 1:
+        return [cached_get(link) for link in links]
+    # executor.map hands the responses back in the order of the links, not the order they finished in, so the
+    # games stay in the same order as they are listed on the BBRef scores page
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(links))) as executor:
+        return list(executor.map(cached_get, links))
+
+
+def start_parse_pool(workers):
+    '''Starts a pool of worker processes for parsing box scores with box_score_farm'''
+    # The worker processes are all started by the first task, so this starts them straight away, before any
+    # download threads are running
+    parse_pool = ProcessPoolExecutor(max_workers=workers)
+    parse_pool.submit(int).result()
+    return parse_pool
+
+
+def box_score_farm(links, game_ids, parse_pool, max_workers=MAX_FETCH_WORKERS, full_record=False):
+    '''Downloads the box scores and parses them in a process pool, returning the parsed games in the order of the links'''
+    # Each page's bytes are handed to the parse_pool as soon as its download finishes, so pages are parsed on the
+    # other cores while the rest are still downloading. Only the bytes go to the workers and only the Game records
+    # (or BoxScores if full_record is True) come back.
+    def fetch_and_submit(link_and_game_id):
+        link, game_id = link_and_game_id
+        response = cached_get(link)
+        return parse_pool.submit(parse_box_score_content, response.content, response.encoding, game_id, full_record)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(links)))) as executor:
+        parse_futures = list(executor.map(fetch_and_submit, zip(links, game_ids)))
+    box_scores = []
+    for parse_future in parse_futures:
+        box_score, seconds = parse_future.result()
+        record_stage('parse_box_score', seconds)
+        box_scores.append(box_score)
+    return box_scores
+
+
+### SCHEDULE SECTION
+def teams_df_creator(teams_list):
+    '''Creates the teams_df which contains the home and away teams for each game'''
+    # Uses parsing function and puts the Python strings into a list, then a flattened list,
+    # then converts full names to abbreviations
+    # Then cuts out the "Preview" column that BBRef provides for games.
+    # Then puts teams into a DataFrame.
+    # Then reshapes the DataFrame, putting the home teams into one column and away teams into another
+    # Then renames the columns.
+    list_of_parsed_teams = [parse(team) for team in teams_list]
+    flattened_list_of_parsed_teams = [team for sublist in list_of_parsed_teams for team in sublist]
+    list_abbr_teams = [abbr_dict.get(n, n) for n in flattened_list_of_parsed_teams]
+    list_abbr_teams = [team for team in list_abbr_teams if team != 'Preview']
+    teams_df = DataFrame(list_abbr_teams)
+    teams_df = pd.DataFrame(teams_df.values.reshape(-1, 2))
+    teams_df.rename(columns={0: 'Away', 1: 'Home'}, inplace=True)
+    return teams_df
+
+
+def time_df_creator(table):
+    '''Creates the time_df which contains the start time for each game'''
+    # All the game start times in each 'table' are tagged with 'strong'. Each game is its own 'p' row, and games
+    # that have already been played show their score instead of a start time, so their time is None. This puts one
+    # time per game into a list (or every 'strong' in the table if it has no game rows), parsed into Python strings
+    # instead of BS4 strings.
+    game_rows = table.find_all('p', {'class': 'game'})
+    if game_rows:
+        times_list = [row.find('strong') for row in game_rows]
+        list_of_parsed_times = [None if start is None else parse(start)[0] for start in times_list]
+    else:
+        list_of_parsed_times = [parse(start)[0] for start in table.find_all('strong')]
+    # Then puts that list into a DataFrame with a 'Time' column.
+    time_df = DataFrame({'Time': list_of_parsed_times}, dtype=object)
+    return time_df
+
+
+def schedule_game_ids(table):
+    '''Returns the BBRef game IDs of the games in a schedule 'table', from their preview or box score links'''
+    # e.g. NYA202204070 from /previews/2022/NYA202204070.shtml or /boxes/NYA/NYA202204070.shtml
+    links = table.find_all('a', href=re.compile('previews|boxes'))
+    return [link['href'].split('/')[-1].split('.')[0] for link in links]
+
+
+def table_date(table):
+    '''Finds the title of the BBRef 'table' the games are being pulled from, without the day of the week'''
+    date_of_table_list = table.find_all('h3')
+    date_of_table = [parse(row) for row in date_of_table_list]
+    date_of_table_flattened = date_of_table[0]
+    date_of_table_str = date_of_table_flattened[0]
+    if date_of_table_str == TODAYS_GAMES:
+        return date_of_table_str
+    date_of_table_str = date_of_table_str[date_of_table_str.find(',') + 2:]
+    return date_of_table_str
+
+
+def schedule_url(year, today=None):
+    '''Returns the link to BBRef's schedule page for a season'''
+    # The current season uses MLB-schedule.shtml, the page with the "Today's Games" table
+    today = today or datetime.date.today()
+    if year == today.year:
+        return SCHEDULE_URL
+    return SEASON_SCHEDULE_URL.format(year=year)
+
+
+def season_schedule(year, today=None):
+    '''Returns the ScheduleIndex of a season's schedule page'''
+    # The page comes through the response cache (past seasons' pages never expire there) and is only parsed the
+    # first time it's seen (see schedule_index.py)
+    def parse_schedule(response):
+        with timed('parse_schedule'):
+            return schedule_index_for(response.text)
+    return cached_parse(schedule_url(year, today), 'schedule_index', parse_schedule)
+
+
+def schedule_frame(table, day, use_store=True):
+    '''Builds the schedule DataFrame of a BBRef 'table' of games that was looked up for a datetime.date'''
+    # All the teams in each "table" are tagged with 'a' and link to the team's page. The other links (Preview on
+    # games to come, Boxscore on games that have been played) are left out.
+    # Creates teams and times DataFrames using previously defined functions
+    with timed('schedule_frames'):
+        teams_df = teams_df_creator(table.find_all('a', href=re.compile('/teams/')))
+        time_df = time_df_creator(table)
+        # Finds the date of the BBRef 'table' you're pulling games from
+        date_of_table_str = table_date(table)
+        # Combines the teams and time DataFrames, adds the date, and sets the index
+        full_df = pd.concat([teams_df, time_df], axis=1)
+        full_df.set_index('Away', inplace=True)
+    # Stamps the DataFrame with the date of the table the games were actually pulled from, rather than just the
+    # date that was asked for. This ensures you are not pulling games in from a table of a different date due to
+    # some sort of error and are not aware of it
+    if date_of_table_str != TODAYS_GAMES:
+        table_day = datetime.datetime.strptime(date_of_table_str, '%B %d, %Y').date()
+    else:
+        table_day = day
+    full_df['Date'] = table_day.strftime('%-m.%-d.%y')
+    full_df.attrs['title'] = date_of_table_str
+    full_df.attrs['game_ids'] = schedule_game_ids(table)
+    if use_store:
+        get_game_store().save_schedule(full_df, table_day)
+    return full_df
+
+
+@timed_request('get_schedule')
+def get_schedule(day, today=None, use_store=True):
+    '''Returns the DataFrame of the games on BBRef's schedule for a datetime.date'''
+    # The title of the BBRef table the games were pulled from is kept in the DataFrame's attrs['title'] and the
+    # games' BBRef game IDs in attrs['game_ids']. The schedule is saved to the game store unless use_store is False.
+    # Raises ValueError if the date isn't on the schedule
+    today = today or datetime.date.today()
+    # Requests the BBRef schedule page of the date's season (through the response cache) and looks up the date's
+    # 'table' of games in the page's index. Today's games are in a table titled "Today's Games" when they're not
+    # titled by date.
+    schedule = season_schedule(day.year, today)
+    return schedule_frame(schedule_table(schedule, day, today), day, use_store)
+
+
+def schedule_table(schedule, day, today=None):
+    '''Returns the 'table' of games for a datetime.date in a season's ScheduleIndex, raising ValueError if there isn't one'''
+    try:
+        return schedule.table_for_date(day, today or datetime.date.today())
+    except KeyError:
+        raise ValueError('No table for ' + day.isoformat() + ' on the Baseball Reference schedule')
+
+
+@timed_request('get_schedules')
+def get_schedules(days, today=None, use_store=True):
+    '''Returns a dictionary of datetime.date -> schedule DataFrame for each of the dates that are on BBRef's schedules'''
+    # The dates can be from any number of seasons. Each season's page is loaded and indexed once, however many of
+    # its dates are asked for. Dates that aren't on their season's schedule are left out.
+    today = today or datetime.date.today()
+    schedules = {}
+    for year in sorted({day.year for day in days}):
+        schedule = season_schedule(year, today)
+        season_days = sorted(day for day in days if day.year == year)
+        for day, table in schedule.tables_for_dates(season_days, today).items():
+            schedules[day] = schedule_frame(table, day, use_store)
+    return schedules
+
+
+# The dates of the schedule page from the last get_schedule_changes call that didn't use the game store, which the
+# next one is compared against
+last_schedule_blocks = None
+
+
+def table_games(table):
+    '''Returns the (away, home, time) of each game in a schedule 'table', with a blank time for games already played'''
+    # Only the team links are read, so the Preview and Boxscore links don't get paired up as teams
+    teams_df = teams_df_creator(table.find_all('a', href=re.compile('/teams/')))
+    time_df = time_df_creator(table)
+    # Games that have been played are listed with their score instead of a start time, and get a blank time
+    times = [game_time or '' for game_time in time_df['Time']]
+    if len(times) != len(teams_df):
+        times = [''] * len(teams_df)
+    return list(zip(teams_df['Away'].tolist(), teams_df['Home'].tolist(), times))
+
+
+def date_game_changes(title, old_games, new_games):
+    '''Returns the get_schedule_changes rows of the games taken off and added to one date'''
+    # A game stays the same game as long as its teams do and its time didn't change (a game that's been played has
+    # no time anymore). Doubleheaders are matched up one game at a time.
+    added = list(new_games)
+    removed = []
+    for away, home, game_time in old_games:
+        match = next((game for game in added if game[:2] == (away, home) and
+                      (game[2] == game_time or not game[2] or not game_time)), None)
+        if match is None:
+            removed.append((away, home, game_time))
+        else:
+            added.remove(match)
+    return [[title, *game, 'removed'] for game in removed] + [[title, *game, 'added'] for game in added]
+
+
+@timed_request('get_schedule_changes')
+def get_schedule_changes(today=None, use_store=True):
+    '''Returns a DataFrame of the games added to or taken off BBRef's schedule since the last time it was checked'''
+    # Columns are Date (the title of the BBRef table, e.g. April 7, 2022, with today's date for "Today's Games"),
+    # Away, Home, Time and Change ('added' or 'removed'). A rescheduled game shows up as removed from its old date
+    # (or time) and added to its new one. The first check has nothing to compare against, so it comes back empty.
+    # What the page looked like at the last check (a hash of each date's block and its games) is kept in the game
+    # store, so every run of the script is compared to the one before it. Only the dates whose block changed are
+    # parsed for their games (see schedule_index.py), and the page itself is revalidated with BBRef through the
+    # response cache. With use_store=False the last check is only remembered for as long as the process runs.
+    global last_schedule_blocks
+    today = today or datetime.date.today()
+    response = cached_get(SCHEDULE_URL)
+    with timed('parse_schedule'):
+        schedule = schedule_index_for(response.text)
+    # "Today's Games" is titled by its date, so it's still the same date when the page is checked again tomorrow
+    titles = {}
+    for key in schedule.dates():
+        titles.setdefault(format_date(today) if key == TODAYS_GAMES else key, key)
+    if use_store:
+        previous = get_game_store().load_schedule_blocks()
+    else:
+        previous = last_schedule_blocks or {}
+    blocks = {}
+    rows = []
+    for title, key in titles.items():
+        block_hash = schedule.hashes[key]
+        if title in previous and previous[title][0] == block_hash:
+            continue
+        blocks[title] = (block_hash, table_games(schedule.table(key)))
+        if previous:
+            rows += date_game_changes(title, previous.get(title, (None, []))[1], blocks[title][1])
+    removed = [title for title in previous if title not in titles]
+    for title in removed:
+        rows += date_game_changes(title, previous[title][1], [])
+    if use_store:
+        if blocks or removed:
+            get_game_store().save_schedule_blocks(blocks, removed)
+    else:
+        last_schedule_blocks = {title: blocks.get(title) or previous[title] for title in titles}
+    return pd.DataFrame(rows, columns=['Date', 'Away', 'Home', 'Time', 'Change'])
+
+
+### POSTPONEMENTS SECTION
+@timed_request('postponement_checker')
+def postponement_checker(day, month, year=None):
+    '''Function that checks with ESPN to make sure BBRef isn't missing any game's from the day before that got postponed to the date of interest'''
+    # Returns a list of the postponed games as 'Away-Home' team mascots. day and month are the day before the date of
+    # interest, in the current year unless year is given.
+    game_date = datetime.date(year or datetime.date.today().year, int(month), int(day))
+    next_date = game_date + datetime.timedelta(days=1)
+    # Goes to ESPN's scoreboard for the given date (see espn_postponements.py) and keeps the games that are
+    # supposed to be made up the next day
+    postponements = day_postponements(game_date)
+    return [f'{game.away}-{game.home}' for game in postponements if game.makeup_date == next_date]
+
+
+def check_postponements(day):
+    '''Returns a DataFrame (Away, Home) of the games ESPN lists as postponed from the day before to a datetime.date'''
+    # The link to ESPN's scoreboard for the date is kept in the DataFrame's attrs['espn_url']
+    previous_day = day - datetime.timedelta(days=1)
+    postponed_list = postponement_checker(previous_day.day, previous_day.month, previous_day.year)
+    postponed_df = pd.DataFrame([game.split('-', 1) for game in postponed_list], columns=['Away', 'Home'])
+    postponed_df.attrs['espn_url'] = scoreboard_url(day)
+    return postponed_df
+
+
+def get_postponements(start, end, max_workers=MAX_FETCH_WORKERS):
+    '''Returns a DataFrame (Original Date, Makeup Date, Away, Home) of every game ESPN lists as postponed from start to end'''
+    # start and end are datetime.dates (inclusive). Each date's scoreboard is downloaded once.
+    postponements = scan_postponements(start, end, max_workers)
+    return pd.DataFrame(postponements, columns=['Original Date', 'Makeup Date', 'Away', 'Home'])
+
+
+# Background thread the ESPN postponement checks run on, created the first time it's needed
+postponement_executor = None
+postponement_executor_lock = threading.Lock()
+
+
+def start_postponement_check(day):
+    '''Starts check_postponements for a datetime.date in the background and returns its Future'''
+    global postponement_executor
+    with postponement_executor_lock:
+        if postponement_executor is None:
+            postponement_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='postponements')
+    return postponement_executor.submit(check_postponements, day)
+
+
+def get_schedule_and_postponements(day, today=None):
+    '''Returns the schedule DataFrame and the postponed games DataFrame for a datetime.date'''
+    # The ESPN check is started before the BBRef schedule is requested so the two pages load at the same time,
+    # and the whole thing takes about as long as the slower of the two rather than both added together
+    postponements = start_postponement_check(day)
+    full_df = get_schedule(day, today)
+    return full_df, postponements.result()
+
+
+### SCORES SECTION
+def boxes_index_url(day):
+    '''Returns the link to BBRef's scores page for a datetime.date'''
+    return ('https://www.baseball-reference.com/boxes/?year=' + day.strftime('%Y') + '&month=' + day.strftime('%-m') +
+            '&day=' + day.strftime('%-d'))
+
+
+def scores_page_soup(day):
+    '''Returns the BeautifulSoup of BBRef's scores page for a datetime.date, only parsing it once in a fetch_run'''
+    def parse_page(response):
+        with timed('parse_scores_page'):
+            return BeautifulSoup(response.text, features="html.parser")
+    return cached_parse(boxes_index_url(day), 'soup', parse_page)
+
+
+def box_score_link(game):
+    '''Returns the BBRef game ID and the full box score link of a game on the scores page, or None if it has no box score'''
+    # Finds the link to the box score for the given game (a 'game_summary' div)
+    link = game.find_all('a', href=re.compile('boxes'))
+    # Games that haven't started yet only link to their preview (/previews/...), so there's no box score to get
+    if not link:
+        return None
+    # Takes the BS4 link (which is really just the end of the actual box score link) and then adds it to
+    # the generic baseball-reference address to get the full link
+    for individual_link in link:
+        link_ending = (individual_link['href'])
+    # The BBRef game ID is the name of the box score page (e.g. NYA202204070 from /boxes/NYA/NYA202204070.shtml)
+    game_id = link_ending.split('/')[-1].split('.')[0]
+    return game_id, 'https://www.baseball-reference.com/' + link_ending
+
+
+def summary_game_id(game):
+    '''Returns the BBRef game ID of a game on the scores page from its box score or preview link, or None'''
+    # e.g. NYA202204070 from /previews/2022/NYA202204070.shtml or /boxes/NYA/NYA202204070.shtml
+    game_ids = schedule_game_ids(game)
+    return game_ids[-1] if game_ids else None
+
+
+def game_finished(game):
+    '''Returns True if a game on the scores page is final, or won't be played on its date (postponed or cancelled)'''
+    # The status is the text of the link to the box score (e.g. Final). Games without one haven't started.
+    status_links = [str(link.string) for link in game.find_all('a', href=re.compile('boxes'))]
+    if status_links:
+        return status_links[-1].startswith('Final')
+    return NOT_PLAYED.search(' '.join(game.stripped_strings)) is not None
+
+
+# Definition of the function that creates the scores DataFrame
+def scores_df_creator(month, day, year, max_workers=MAX_FETCH_WORKERS, skip_game_ids=(), records=None,
+                      parse_pool=None):
+    '''Scrapes BBRef for the inning-by-inning scores of a date and returns them with the date of the page they came from'''
+    # Whether every game on the page was final (or postponed) is kept in the DataFrame's attrs['all_final']
+    # Games whose BBRef game ID is in skip_game_ids are left out without downloading their box score
+    # If a list is passed as records, the full BoxScore of each game (batting, pitching, attendance...) is parsed out
+    # of the same download and added to it
+    # If a parse_pool (see start_parse_pool) is passed, the box scores are parsed in its worker processes
+    # Retrieves the page for all scores of the date passed as arguments to the function as a BeautifulSoup object
+    soup = scores_page_soup(datetime.date(int(year), int(month), int(day)))
+    # Creates an accumulator that each game's box score is added to in the for loop below. The DataFrame of all
+    # the games is only built once, after the loop.
+    accumulator = LinescoreAccumulator(capacity=2 * 16)
+    # Retrieves a list of all the individual games' code to be cycled through in the 'for loop' below
+    games = soup.find_all('div', {'class': 'game_summary nohover'})
+    # Finds the link to the box score for each game in the 'games' list above so they can all be fetched at once
+    full_links = []
+    game_ids = []
+    for game in games:
+        box_score = box_score_link(game)
+        # Games that haven't started yet have no box score and aren't in the scores
+        if box_score is None:
+            continue
+        game_id, full_link = box_score
+        if game_id in skip_game_ids:
+            continue
+        game_ids.append(game_id)
+        full_links.append(full_link)
+    # Retrieves the pages for all the box scores concurrently. They come back in the same order as the games
+    # are listed on the scores page, so the final ordering of the games is the same as fetching them one by one
+    if parse_pool is not None:
+        box_scores = box_score_farm(full_links, game_ids, parse_pool, max_workers, records is not None)
+    else:
+        game_responses = box_score_fetcher(full_links, max_workers)
+        box_scores = []
+        # Pulls the team names, the inning-by-inning scores and the start time out of each box score page. Only the
+        # linescore table and the scorebox_meta div are parsed rather than the whole page (see box_scores.py)
+        for game_id, game_response in zip(game_ids, game_responses):
+            with timed('parse_box_score'):
+                if records is None:
+                    box_scores.append(parse_game(game_response.text, game_id))
+                else:
+                    box_scores.append(parse_box_score_record(game_response.text, game_id))
+    # For loop to cycle through each game's parsed box score. Each game is a compact Game record (see
+    # box_scores.py), which is then added to the 'accumulator' created above
+    for game_id, box_score in zip(game_ids, box_scores):
+        if records is not None:
+            records.append(box_score)
+            game = Game.from_cells(game_id, box_score.away_team, box_score.away_cells, box_score.home_team,
+                                   box_score.home_cells, start_time_number(box_score.start_time))
+        else:
+            game = box_score
+        # Finds the abbreviations of both teams
+        game.away.team = abbr_dict.get(game.away.team)
+        game.home.team = abbr_dict.get(game.home.team)
+        # Adds the game's inning-by-inning scores to the accumulator, tagged with the local time it started at for
+        # sorting doubleheaders in the correct order. 'X' (the team did not bat in that half inning) is stored as
+        # a marker that comes out as '-' in the DataFrame.
+        accumulator.add_record(game)
+    # End of 'for loop'.
+    #
+    # Creates a BeautifulSoup object to be used to find the date that the scores are being displayed from
+    # (e.g. Apr 5, 2022)
+    date = soup.find_all('span', {'class': 'button2 current'})
+    parsed_date = parse(date)
+    parsed_date = parsed_date[0] if parsed_date else None
+    all_final = all(game_finished(game) for game in games)
+    # Days without any games (or with all their games skipped) have nothing left to do
+    if len(accumulator) == 0:
+        all_games_df = pd.DataFrame()
+        all_games_df.attrs['all_final'] = all_final
+        return all_games_df, parsed_date
+    # Builds the DataFrame of all the games at once. Half innings a team didn't bat in (and extra innings other
+    # games didn't go to) are '-', and the runs ('R'), hits ('H'), and errors ('E') columns are at the end.
+    with timed('assemble_scores', games=len(accumulator)):
+        all_games_df = accumulator.to_frame()
+    # Stamps the DataFrame with the date from the page the box scores were pulled from.
+    all_games_df['Date'] = scores_page_date(parsed_date).strftime('%-m.%-d.%y')
+    all_games_df.attrs['all_final'] = all_final
+    return all_games_df, parsed_date
+
+
+def scores_page_date(parsed_date):
+    '''Converts the date shown on a BBRef scores page (e.g. Apr 5, 2022) into a datetime.date'''
+    parsed_date_split = parsed_date.split(' ')
+    month_number = list(calendar.month_abbr).index(parsed_date_split[0])
+    return datetime.date(int(parsed_date_split[2]), month_number, int(parsed_date_split[1].split(',')[0]))
+
+
+@timed_request('get_scores')
+def get_scores(day, max_workers=MAX_FETCH_WORKERS, use_store=True, refresh=False):
+    '''Returns the DataFrame of the inning-by-inning scores for a datetime.date, sorted by local start time'''
+    # The date shown on the BBRef page the scores came from (e.g. Apr 5, 2022) is kept in attrs['page_date']. BBRef
+    # redirects dates it doesn't have scores for yet to an earlier date, so it may not match the date asked for.
+    # Dates whose scores are complete in the game store are loaded from it instead of being scraped, and anything
+    # scraped is saved to it (unless use_store is False). refresh scrapes the date again even if it's complete,
+    # replacing what the store has for it.
+    if use_store and not refresh:
+        with timed('load_stored_scores'):
+            stored_df = get_game_store().load_scores(day)
+        if stored_df is not None:
+            return stored_df
+    all_games_df, parsed_date = scores_df_creator(day.strftime('%-m'), day.strftime('%-d'), day.strftime('%Y'),
+                                                  max_workers)
+    # Sorts the games by the local start time to ensure the first doubleheader game comes before the second
+    # doubleheader game
+    if not all_games_df.empty:
+        all_games_df = all_games_df.sort_values(by=['Local Start Time'], kind='mergesort')
+    all_games_df.attrs['page_date'] = parsed_date
+    if use_store:
+        get_game_store().save_scores(all_games_df, day, parsed_date)
+    return all_games_df
+
+
+@timed_request('get_box_scores')
+def get_box_scores(day, max_workers=MAX_FETCH_WORKERS, use_store=True):
+    '''Returns the scores DataFrame for a datetime.date along with a list of every game's full BoxScore record'''
+    # The records (see box_scores.BoxScore) have the batting and pitching lines, attendance, venue and duration of
+    # each game, taken from the same download of the box score as the linescore, in the order BBRef lists the games.
+    # The linescores are saved to the game store like get_scores' (unless use_store is False).
+    records = []
+    all_games_df, parsed_date = scores_df_creator(day.strftime('%-m'), day.strftime('%-d'), day.strftime('%Y'),
+                                                  max_workers, records=records)
+    if not all_games_df.empty:
+        all_games_df = all_games_df.sort_values(by=['Local Start Time'], kind='mergesort')
+    all_games_df.attrs['page_date'] = parsed_date
+    if use_store:
+        get_game_store().save_scores(all_games_df, day, parsed_date)
+    return all_games_df, records
+
+
+class ScoresStream:
+    '''Iterates over a date's games, yielding each one as a Game record as soon as its box score is downloaded and parsed'''
+
+    def __init__(self, day, max_workers=MAX_FETCH_WORKERS):
+        self.day = day
+        self.max_workers = max_workers
+        # Set once iterating has loaded the scores page: the date shown on the page (e.g. Apr 5, 2022), which may not
+        # be the date asked for (see get_scores), and game ID -> where the game is listed on the page
+        self.page_date = None
+        self.positions = {}
+        # box score link -> game ID, once the scores page is loaded
+        self.links = None
+        # Whether every game on the scores page was final (or postponed), once it's loaded
+        self.all_final = False
+
+    def load_page(self):
+        '''Loads the scores page, setting page_date and positions, without downloading any box scores yet'''
+        self.read_soup(scores_page_soup(self.day))
+
+    def read_page(self, html):
+        '''Sets page_date, positions and links from the html of the scores page, however it was downloaded'''
+        with timed('parse_scores_page'):
+            self.read_soup(BeautifulSoup(html, features="html.parser"))
+
+    def read_soup(self, soup):
+        '''Sets page_date, positions and links from the BeautifulSoup of the scores page'''
+        parsed_date = parse(soup.find_all('span', {'class': 'button2 current'}))
+        self.page_date = parsed_date[0] if parsed_date else None
+        self.links = {}
+        games = soup.find_all('div', {'class': 'game_summary nohover'})
+        self.all_final = all(game_finished(game) for game in games)
+        for game in games:
+            box_score = box_score_link(game)
+            # Games that haven't started yet have no box score to stream
+            if box_score is None:
+                continue
+            game_id, full_link = box_score
+            self.positions[game_id] = len(self.positions)
+            self.links[full_link] = game_id
+
+    def __iter__(self):
+        # The games come out in the order their box scores finish downloading, not the order they're listed in, so
+        # the first finished games can be used while the rest are still downloading
+        if self.links is None:
+            self.load_page()
+        if not self.links:
+            return
+        executor = ThreadPoolExecutor(max_workers=min(self.max_workers, len(self.links)))
+        try:
+            futures = {executor.submit(cached_get, link): game_id for link, game_id in self.links.items()}
+            for future in as_completed(futures):
+                yield scores_game(future.result().text, futures[future])
+        finally:
+            # If the loop over the games is stopped early, the downloads that haven't started yet are dropped
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+def scores_game(html, game_id):
+    '''Parses a box score page into a Game record with the teams' abbreviations, the way the scores DataFrame has them'''
+    with timed('parse_box_score'):
+        game = parse_game(html, game_id)
+    game.away.team = abbr_dict.get(game.away.team)
+    game.home.team = abbr_dict.get(game.home.team)
+    return game
+
+
+def collect_scores(stream, games=None):
+    '''Returns the scores DataFrame of a ScoresStream, exactly as get_scores gives it'''
+    # games are the Games already taken from the stream, if it's been iterated over. Otherwise it's iterated here.
+    if games is None:
+        games = list(stream)
+    if not games:
+        all_games_df = pd.DataFrame()
+    else:
+        # Puts the games back in the order they're listed on the scores page before sorting by start time, so games
+        # that start at the same time come out in the same order as get_scores
+        games = sorted(games, key=lambda game: stream.positions[game.game_id])
+        with timed('assemble_scores', games=len(games)):
+            all_games_df = games_frame(games)
+        all_games_df['Date'] = scores_page_date(stream.page_date).strftime('%-m.%-d.%y')
+        all_games_df = all_games_df.sort_values(by=['Local Start Time'], kind='mergesort')
+    all_games_df.attrs['page_date'] = stream.page_date
+    all_games_df.attrs['all_final'] = stream.all_final
+    return all_games_df
+
+
+def stream_games(start, end, max_workers=MAX_FETCH_WORKERS):
+    '''Yields every game from start to end (datetime.dates, inclusive) as a Game record, a date at a time'''
+    # Only one date's games are ever being downloaded and none are kept, so memory stays the same however long the
+    # range is. Dates BBRef redirects to another date's page are skipped.
+    current_date = start
+    while current_date <= end:
+        stream = ScoresStream(current_date, max_workers)
+        stream.load_page()
+        if stream.page_date is not None and scores_page_date(stream.page_date) == current_date:
+            yield from stream
+        current_date += datetime.timedelta(days=1)
+
+
+def scores_backfill(start_date, end_date, output_dir, max_workers=MAX_FETCH_WORKERS, store_dir=None,
+                    store_format='parquet', parse_workers=PARSE_WORKERS, progress=None):
+    '''Scrapes the scores of every date from start_date to end_date (inclusive), writing one CSV per date'''
+    # progress, if given, is called with each date (YYYY-MM-DD) and its number of games as soon as the date is done
+    # If store_dir is given, each date's scores are also appended to the Parquet/Arrow datasets there (storage.py)
+    # If parse_workers is more than 0, the box scores are parsed in that many worker processes (one per core is
+    # usually best) while the next ones download, instead of all being parsed on one core in this process
+    # Each date's scores are written to output_dir/<date>.csv as soon as that date is done, and a checkpoint of the
+    # completed dates and game IDs is saved after each one, so a run that gets killed picks up where it left off
+    # without downloading anything again
+    os.makedirs(output_dir, exist_ok=True)
+    checkpoint_path = os.path.join(output_dir, 'checkpoint.json')
+    if os.path.exists(checkpoint_path):
+        with open(checkpoint_path) as checkpoint_file:
+            checkpoint = json.load(checkpoint_file)
+    else:
+        checkpoint = {'completed_dates': [], 'game_ids': []}
+    completed_dates = set(checkpoint['completed_dates'])
+    completed_game_ids = set(checkpoint['game_ids'])
+    current_date = datetime.date.fromisoformat(start_date)
+    last_date = datetime.date.fromisoformat(end_date)
+    parse_pool = start_parse_pool(parse_workers) if parse_workers > 0 else None
+    try:
+        while current_date <= last_date:
+            date_str = current_date.isoformat()
+            if date_str not in completed_dates:
+                all_games_df, parsed_date = scores_df_creator(current_date.strftime('%-m'),
+                                                              current_date.strftime('%-d'),
+                                                              current_date.strftime('%Y'), max_workers,
+                                                              completed_game_ids, parse_pool=parse_pool)
+                # BBRef redirects dates it doesn't have scores for to another date, so those games aren't kept here
+                if parsed_date is None or scores_page_date(parsed_date) != current_date:
+                    all_games_df = all_games_df.iloc[0:0]
+                if not all_games_df.empty:
+                    # Writes to a temporary file first so a killed run never leaves half a CSV behind
+                    csv_path = os.path.join(output_dir, date_str + '.csv')
+                    all_games_df.to_csv(csv_path + '.tmp', index_label='Team')
+                    os.replace(csv_path + '.tmp', csv_path)
+                    if store_dir is not None:
+                        import storage
+                        storage.save_scores(all_games_df, store_dir, store_format)
+                    completed_game_ids.update(all_games_df['Game ID'])
+                completed_dates.add(date_str)
+                checkpoint = {'completed_dates': sorted(completed_dates), 'game_ids': sorted(completed_game_ids)}
+                with open(checkpoint_path + '.tmp', 'w') as checkpoint_file:
+                    json.dump(checkpoint, checkpoint_file)
+                os.replace(checkpoint_path + '.tmp', checkpoint_path)
+                if progress is not None:
+                    progress(date_str, len(all_games_df) // 2)
+            current_date += datetime.timedelta(days=1)
+    finally:
+        if parse_pool is not None:
+            parse_pool.shutdown()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Compares building the scores DataFrame the old way (two small DataFrames per game, appended to the running frame
+one game at a time) against LinescoreAccumulator, at a day's slate, a full season and several seasons of games.
+
+Usage:
+    python benchmarks/linescore_benchmark.py [--sizes 15 2430 20000] [--legacy-max 2430]
+
+The old way gets quadratically slower as games are added, so it's skipped above --legacy-max games.
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+from pandas import DataFrame
+
+import box_scores
+
+
+def synthetic_games(count, seed=0):
+    '''Returns count parsed games in the same form parse_box_score gives them (with a game ID and start time)'''
+    rng = random.Random(seed)
+    games = []
+    for number in range(count):
+        innings = rng.choice([9] * 8 + [10, 11, 12])
+        away = [str(rng.choice([0, 0, 0, 1, 1, 2, 3])) for _ in range(innings)]
+        home = [str(rng.choice([0, 0, 0, 1, 1, 2, 3])) for _ in range(innings)]
+        if rng.random() < 0.5:
+            home[-1] = 'X'
+        away += [str(sum(int(run) for run in away)), str(rng.randint(3, 14)), str(rng.randint(0, 2))]
+        home += [str(sum(int(run) for run in home if run != 'X')), str(rng.randint(3, 14)), str(rng.randint(0, 2))]
+        games.append((f'GAM{number:09d}', 'AWY', away, 'HOM', home, rng.choice([1.08, 4.17, 7.08, 7.67])))
+    return games
+
+
+def legacy_team_df(team, cells):
+    '''Builds one team's one-row DataFrame the way scores_compiler used to'''
+    ints = [int(cell) if cell != 'X' else cell for cell in cells]
+    team_df = DataFrame(ints)
+    team_df = pd.DataFrame(team_df.values.reshape(1, len(cells)), index=[team])
+    columns = {inning: str(inning + 1) for inning in range(26)}
+    columns.update({team_df.columns[-3]: 'R', team_df.columns[-2]: 'H', team_df.columns[-1]: 'E'})
+    team_df.rename(columns=columns, inplace=True)
+    return team_df
+
+
+def legacy_build(games):
+    '''Builds the scores DataFrame by appending a small DataFrame per game, then cleaning up the whole frame'''
+    all_games_df = pd.DataFrame()
+    for game_id, away_team, away_cells, home_team, home_cells, start_time in games:
+        full_df = pd.concat([legacy_team_df(away_team, away_cells), legacy_team_df(home_team, home_cells)])
+        full_df['Local Start Time'] = start_time
+        full_df['Game ID'] = game_id
+        full_df.insert(loc=0, column='Total R', value=full_df['R'])
+        full_df.insert(loc=0, column='1st5 R', value=full_df['1'] + full_df['2'] + full_df['3'] + full_df['4'] +
+                       full_df['5'])
+        # DataFrame.append was removed in pandas 2, concat with the running frame does the same copy every game
+        all_games_df = pd.concat([all_games_df, full_df])
+    all_games_df = all_games_df.fillna('-')
+    all_games_df = all_games_df.replace('X', '-')
+    for label in ('R', 'H', 'E'):
+        all_games_df[label] = all_games_df.pop(label)
+    return all_games_df
+
+
+def accumulator_build(games):
+    '''Builds the scores DataFrame with LinescoreAccumulator'''
+    accumulator = box_scores.LinescoreAccumulator()
+    for game in games:
+        accumulator.add_game(*game)
+    return accumulator.to_frame()
+
+
+def timed(build, games):
+    start = time.perf_counter()
+    build(games)
+    return time.perf_counter() - start
+
+
+def main():
+    argument_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    argument_parser.add_argument('--sizes', type=int, nargs='+', default=[15, 2430, 20000], help='numbers of games')
+    argument_parser.add_argument('--legacy-max', type=int, default=2430, help='largest size the old way is run at')
+    args = argument_parser.parse_args()
+    print(f'{"games":>8}{"old s":>12}{"new s":>12}{"old us/game":>14}{"new us/game":>14}')
+    for size in args.sizes:
+        games = synthetic_games(size)
+        new = timed(accumulator_build, games)
+        if size <= args.legacy_max:
+            old = timed(legacy_build, games)
+            print(f'{size:>8}{old:>12.3f}{new:>12.3f}{old / size * 1e6:>14.0f}{new / size * 1e6:>14.0f}')
+        else:
+            print(f'{size:>8}{"skipped":>12}{new:>12.3f}{"-":>14}{new / size * 1e6:>14.0f}')
+
+
+if __name__ == '__main__':
+    main()
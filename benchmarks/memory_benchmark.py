@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Compares the memory it takes to hold a full season of parsed games in each of the forms the scraper has used:
+    string tuples  - (game ID, away team, away cells, home team, home cells, start time) with the cells as lists of
+                     strings, the way parse_box_score gives them
+    DataFrames     - two one-row DataFrames per game, the way scores_compiler used to build them
+    Game records   - box_scores.Game / Linescore, with __slots__ and array('h') innings
+    scores frame   - the one scores DataFrame built from the Game records at the end (for comparison)
+
+Usage:
+    python benchmarks/memory_benchmark.py [--games 2430]
+
+Memory is measured with tracemalloc: "held" is what's still allocated once the season is built and "peak" is the
+most that was allocated at once while building it.
+"""
+
+import argparse
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import box_scores
+from linescore_benchmark import legacy_team_df, synthetic_games
+
+
+def string_tuples(games):
+    return list(games)
+
+
+def game_dataframes(games):
+    return [(legacy_team_df(away_team, away_cells), legacy_team_df(home_team, home_cells))
+            for _, away_team, away_cells, home_team, home_cells, _ in games]
+
+
+def game_records(games):
+    return [box_scores.Game.from_cells(*game) for game in games]
+
+
+def scores_frame(games):
+    return box_scores.games_frame(game_records(games))
+
+
+def season_memory(build, count):
+    '''Returns the bytes still held and the peak bytes of building count games with build'''
+    # The synthetic games are made inside the trace too, since parsing makes them in the real scraper. They're
+    # freed once build returns unless build keeps them.
+    tracemalloc.start()
+    season = build(synthetic_games(count))
+    held, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del season
+    return held, peak
+
+
+def main():
+    argument_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    argument_parser.add_argument('--games', type=int, default=2430, help='number of games (default: a full season)')
+    args = argument_parser.parse_args()
+    # Makes sure the records build the same scores DataFrame as the cells they came from
+    games = synthetic_games(50)
+    accumulator = box_scores.LinescoreAccumulator()
+    for game in games:
+        accumulator.add_game(*game)
+    if not accumulator.to_frame().equals(box_scores.games_frame(game_records(games))):
+        sys.exit('Game records give a different scores DataFrame')
+    print(f'{args.games} games')
+    print(f'{"form":<16}{"held MB":>10}{"peak MB":>10}{"bytes/game":>12}')
+    for label, build in (('string tuples', string_tuples), ('DataFrames', game_dataframes),
+                         ('Game records', game_records), ('scores frame', scores_frame)):
+        held, peak = season_memory(build, args.games)
+        print(f'{label:<16}{held / 1024 / 1024:>10.2f}{peak / 1024 / 1024:>10.2f}{held / args.games:>12.0f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Compares the per-page parse time and peak memory of the full-page box score parse against the fast path that only
+parses the linescore table and scorebox_meta div, the same fast path emitting a compact Game record, and the full
+BoxScore record parse (linescore, game details, batting and pitching tables) for comparison.
+
+Usage:
+    python benchmarks/parse_benchmark.py [--fixtures DIR] [--repeat N]
+
+DIR should hold saved BBRef box score pages (*.shtml or *.html). Without it, synthetic box score pages of about
+the same size as real ones are generated. Every page is checked to give identical results with both parsers.
+"""
+
+import argparse
+import datetime
+import glob
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import box_scores
+import synthetic_pages
+
+
+def load_pages(fixtures_dir):
+    '''Returns a list of (name, html) for the saved pages in fixtures_dir, or synthetic pages if it's None'''
+    if fixtures_dir:
+        paths = sorted(glob.glob(os.path.join(fixtures_dir, '*.shtml')) + glob.glob(os.path.join(fixtures_dir, '*.html')))
+        pages = []
+        for path in paths:
+            with open(path, encoding='utf-8', errors='replace') as page_file:
+                pages.append((os.path.basename(path), page_file.read()))
+        return pages
+    game_date = datetime.date(2022, 4, 7)
+    return [(game_id, synthetic_pages.box_score_page(away, home, game_date, start_time, seed=number))
+            for number, (away, home, game_id, start_time) in enumerate(synthetic_pages.slate(game_date))]
+
+
+def time_parser(parser, pages, repeat):
+    '''Returns the median seconds per page for a parser'''
+    per_page = []
+    for _, html in pages:
+        runs = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            parser(html)
+            runs.append(time.perf_counter() - start)
+        per_page.append(sorted(runs)[len(runs) // 2])
+    return sum(per_page) / len(per_page)
+
+
+def peak_memory(parser, pages):
+    '''Returns the largest peak traced memory (in bytes) of parsing a single page'''
+    peaks = []
+    for _, html in pages:
+        tracemalloc.start()
+        parser(html)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return max(peaks)
+
+
+def main():
+    argument_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    argument_parser.add_argument('--fixtures', help='directory of saved box score pages')
+    argument_parser.add_argument('--repeat', type=int, default=5, help='times each page is parsed per parser')
+    args = argument_parser.parse_args()
+    pages = load_pages(args.fixtures)
+    if not pages:
+        sys.exit('No pages found in ' + args.fixtures)
+    # Makes sure the fast path gives exactly the same results before timing anything
+    for name, html in pages:
+        fast = box_scores.parse_box_score_fast(html)
+        if box_scores.parse_box_score_full(html) != fast:
+            sys.exit('Parsers disagree on ' + name)
+        game = box_scores.Game.from_cells(name, fast[0], fast[1], fast[2], fast[3],
+                                          box_scores.start_time_number(fast[4]))
+        if box_scores.parse_game(html, name) != game:
+            sys.exit('parse_game disagrees on ' + name)
+    average_size = sum(len(html) for _, html in pages) / len(pages)
+    print(f'{len(pages)} pages, {average_size / 1024:.0f} KB average, fragment parser: {box_scores.FRAGMENT_PARSER}')
+    print(f'{"parser":<8}{"ms/page":>10}{"peak MB":>10}')
+    results = {}
+    for label, parser in (('full', box_scores.parse_box_score_full), ('fast', box_scores.parse_box_score_fast),
+                          ('game', box_scores.parse_game), ('record', box_scores.parse_box_score_record)):
+        results[label] = time_parser(parser, pages, args.repeat)
+        print(f'{label:<8}{results[label] * 1000:>10.2f}{peak_memory(parser, pages) / 1024 / 1024:>10.2f}')
+    print(f'speedup: {results["full"] / results["fast"]:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
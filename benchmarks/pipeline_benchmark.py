@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Times each stage of the scrape pipeline offline, by replaying recorded (or synthetic) pages instead of hitting BBRef
+and ESPN:
+    fetch         - every page downloaded through http_session.HttpFetcher from a local stub server
+    parse         - the schedule page index, the scores pages and the box score pages
+    teams/time    - teams_df_creator and time_df_creator for every date on the schedule
+    linescores    - building each date's scores DataFrame with LinescoreAccumulator
+    postponements - postponement_checker for every ESPN scoreboard
+    get_scores    - the whole scores request for each date, end to end
+Each stage reports p50/p99 latency, throughput and the peak RSS of the process once it's done.
+
+Usage:
+    python benchmarks/pipeline_benchmark.py [--fixtures DIR] [--days N] [--repeat N]
+                                            [--save-baseline FILE] [--baseline FILE] [--tolerance 0.2]
+    python benchmarks/pipeline_benchmark.py --record DIR --start YYYY-MM-DD [--days N]
+
+A fixture directory holds one file per page plus a manifest.json of url -> file name. --record downloads the pages
+for --days dates starting at --start (through the response cache) and saves them as fixtures. Without --fixtures,
+synthetic pages for --days dates are generated. --baseline compares the p50 latencies against a file written by
+--save-baseline and exits with status 1 if any stage got slower by more than --tolerance.
+"""
+
+import argparse
+import datetime
+import json
+import math
+import os
+import re
+import resource
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import quote, unquote
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bs4 import BeautifulSoup
+
+import bbref_scraper
+import box_scores
+import http_cache
+import http_session
+import schedule_index
+import synthetic_pages
+
+
+def synthetic_fixtures(first_date, days):
+    '''Returns url -> html for synthetic schedule, scores, box score and ESPN pages covering days dates'''
+    pages = {bbref_scraper.SCHEDULE_URL: synthetic_pages.schedule_page(first_date, days)}
+    for offset in range(days):
+        game_date = first_date + datetime.timedelta(days=offset)
+        games = synthetic_pages.slate(game_date)
+        pages[bbref_scraper.boxes_index_url(game_date)] = synthetic_pages.boxes_index_page(game_date, games)
+        for number, (away, home, game_id, start_time) in enumerate(games):
+            link = 'https://www.baseball-reference.com//boxes/' + home[1] + '/' + game_id + '.shtml'
+            pages[link] = synthetic_pages.box_score_page(away, home, game_date, start_time, seed=number)
+        espn_url = bbref_scraper.scoreboard_url(game_date)
+        pages[espn_url] = synthetic_pages.espn_scoreboard_page(game_date, [('Yankees', 'Red Sox')])
+    return pages
+
+
+def load_fixtures(fixtures_dir):
+    '''Returns url -> html for the pages saved in a fixture directory'''
+    with open(os.path.join(fixtures_dir, 'manifest.json')) as manifest_file:
+        manifest = json.load(manifest_file)
+    pages = {}
+    for url, name in manifest.items():
+        with open(os.path.join(fixtures_dir, name), encoding='utf-8', errors='replace') as page_file:
+            pages[url] = page_file.read()
+    return pages
+
+
+def record_fixtures(fixtures_dir, first_date, days):
+    '''Downloads the pages for days dates starting at first_date and saves them as fixtures'''
+    pages = {bbref_scraper.SCHEDULE_URL: http_cache.cached_get(bbref_scraper.SCHEDULE_URL).text}
+    for offset in range(days):
+        game_date = first_date + datetime.timedelta(days=offset)
+        scores_url = bbref_scraper.boxes_index_url(game_date)
+        pages[scores_url] = http_cache.cached_get(scores_url).text
+        soup = BeautifulSoup(pages[scores_url], features="html.parser")
+        for game in soup.find_all('div', {'class': 'game_summary nohover'}):
+            box_score = bbref_scraper.box_score_link(game)
+            if box_score is not None:
+                pages[box_score[1]] = http_cache.cached_get(box_score[1]).text
+        espn_url = bbref_scraper.scoreboard_url(game_date)
+        pages[espn_url] = http_cache.cached_get(espn_url).text
+    os.makedirs(fixtures_dir, exist_ok=True)
+    manifest = {}
+    for number, (url, html) in enumerate(sorted(pages.items())):
+        name = f'page{number:05d}.html'
+        with open(os.path.join(fixtures_dir, name), 'w', encoding='utf-8') as page_file:
+            page_file.write(html)
+        manifest[url] = name
+    with open(os.path.join(fixtures_dir, 'manifest.json'), 'w') as manifest_file:
+        json.dump(manifest, manifest_file, indent=1)
+    print(f'Saved {len(pages)} pages to {fixtures_dir}')
+
+
+def stub_server(pages):
+    '''Starts a local HTTP server that serves each page at /<quoted url> and returns it'''
+    encoded_pages = {url: html.encode('utf-8') for url, html in pages.items()}
+
+    class FixtureHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            body = encoded_pages.get(unquote(self.path[1:]))
+            if body is None:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FixtureHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def percentile(values, fraction):
+    '''Returns the nearest-rank percentile of a list of values'''
+    ordered = sorted(values)
+    return ordered[max(0, min(len(ordered) - 1, math.ceil(fraction * len(ordered)) - 1))]
+
+
+def peak_rss_mb():
+    '''Returns the peak resident set size of the process so far in MB'''
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KB, macOS reports bytes
+    return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+
+
+def time_calls(function, items, repeat):
+    '''Calls function on each item repeat times and returns the seconds each call took'''
+    latencies = []
+    for _ in range(repeat):
+        for item in items:
+            start = time.perf_counter()
+            function(item)
+            latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def stage_result(latencies, units, unit_name):
+    '''Summarises a stage's latencies, with units (games, pages...) processed per second'''
+    total = sum(latencies)
+    return {'calls': len(latencies), 'p50_ms': percentile(latencies, 0.5) * 1000,
+            'p99_ms': percentile(latencies, 0.99) * 1000, 'total_s': total,
+            'rate': units / total if total else float('inf'), 'unit': unit_name, 'peak_rss_mb': peak_rss_mb()}
+
+
+def run_stages(pages, repeat):
+    '''Runs every stage of the pipeline over the pages and returns stage name -> result'''
+    results = {}
+    # Every request the scraper makes is answered from the pages instead of the network, including the pages read
+    # through http_cache.cached_parse
+    bbref_scraper.cached_get = http_cache.cached_get = lambda url, fetch=None: http_cache.CachedResponse(
+        url, 200, pages[url].encode('utf-8'), 'utf-8', True)
+    scores_urls = {url: http_cache.url_date(http_cache.BOXES_INDEX_DATE, url) for url in pages
+                   if http_cache.url_date(http_cache.BOXES_INDEX_DATE, url)}
+    espn_dates = [http_cache.url_date(http_cache.ESPN_SCOREBOARD_DATE, url) for url in pages
+                  if http_cache.url_date(http_cache.ESPN_SCOREBOARD_DATE, url)]
+
+    # Fetch: each page through the real pooled fetcher, against a local server instead of the sites
+    server = stub_server(pages)
+    base = f'http://127.0.0.1:{server.server_address[1]}/'
+    fetcher = http_session.HttpFetcher(requests_per_second=1e9, burst=1e9)
+    urls = sorted(pages)
+    latencies = time_calls(lambda url: fetcher.get(base + quote(url, safe='')).content, urls, repeat)
+    results['fetch'] = stage_result(latencies, len(latencies), 'pages')
+    fetcher.close()
+    server.shutdown()
+
+    # Parse: the schedule index, each scores page's list of games and each box score's linescore
+    latencies = time_calls(schedule_index.ScheduleIndex, [pages[bbref_scraper.SCHEDULE_URL]], repeat)
+    results['parse schedule'] = stage_result(latencies, len(latencies), 'pages')
+
+    def parse_scores_page(url):
+        soup = BeautifulSoup(pages[url], features="html.parser")
+        links = [bbref_scraper.box_score_link(game) for game in soup.find_all('div', {'class': 'game_summary nohover'})]
+        return [link for link in links if link is not None]
+
+    latencies = time_calls(parse_scores_page, list(scores_urls), repeat)
+    results['parse scores page'] = stage_result(latencies, len(latencies), 'pages')
+    games_by_date = {}
+    for url, game_date in scores_urls.items():
+        games_by_date[game_date] = [(game_id, pages[link]) for game_id, link in parse_scores_page(url)]
+    box_score_pages = [html for games in games_by_date.values() for _, html in games]
+    latencies = time_calls(box_scores.parse_box_score, box_score_pages, repeat)
+    results['parse box score'] = stage_result(latencies, len(latencies), 'games')
+
+    # Teams and times of every date on the schedule
+    index = schedule_index.ScheduleIndex(pages[bbref_scraper.SCHEDULE_URL])
+    tables = [index.table(key) for key in index.dates()]
+    team_links = re.compile('/teams/')
+    latencies = time_calls(lambda table: (bbref_scraper.teams_df_creator(table.find_all('a', href=team_links)),
+                                          bbref_scraper.time_df_creator(table)), tables, repeat)
+    results['teams/time'] = stage_result(latencies, len(latencies), 'dates')
+
+    # Linescore assembly of each date's already parsed games
+    parsed_by_date = {game_date: [(game_id, box_scores.parse_box_score(html)) for game_id, html in games]
+                      for game_date, games in games_by_date.items()}
+
+    def assemble(parsed_games):
+        accumulator = box_scores.LinescoreAccumulator(capacity=2 * len(parsed_games))
+        for game_id, (away, away_cells, home, home_cells, start_time) in parsed_games:
+            accumulator.add_game(game_id, bbref_scraper.abbr_dict.get(away), away_cells,
+                                 bbref_scraper.abbr_dict.get(home), home_cells, box_scores.start_time_number(start_time))
+        return accumulator.to_frame()
+
+    latencies = time_calls(assemble, list(parsed_by_date.values()), repeat)
+    results['linescores'] = stage_result(latencies, len(box_score_pages) * repeat, 'games')
+
+    # Postponement check of each ESPN scoreboard
+    latencies = time_calls(lambda day: bbref_scraper.postponement_checker(day.day, day.month, day.year), espn_dates,
+                           repeat)
+    results['postponements'] = stage_result(latencies, len(latencies), 'pages')
+
+    # The whole scores request for each date
+    latencies = time_calls(lambda day: bbref_scraper.get_scores(day, max_workers=1, use_store=False),
+                           list(scores_urls.values()), repeat)
+    results['get_scores'] = stage_result(latencies, len(box_score_pages) * repeat, 'games')
+    return results
+
+
+def print_results(results, baseline=None, tolerance=0.2):
+    '''Prints a table of the results, compared with the baseline if there is one, and returns the regressed stages'''
+    print(f'{"stage":<18}{"calls":>7}{"p50 ms":>10}{"p99 ms":>10}{"rate":>18}{"peak RSS MB":>13}'
+          + (f'{"p50 vs baseline":>17}' if baseline else ''))
+    regressions = []
+    for stage, result in results.items():
+        line = (f'{stage:<18}{result["calls"]:>7}{result["p50_ms"]:>10.2f}{result["p99_ms"]:>10.2f}'
+                f'{result["rate"]:>12.1f} {result["unit"] + "/s":<7}{result["peak_rss_mb"]:>11.1f}')
+        if baseline and stage in baseline:
+            change = result['p50_ms'] / baseline[stage]['p50_ms'] - 1
+            line += f'{change:>+16.0%}'
+            if change > tolerance:
+                line += '  REGRESSION'
+                regressions.append(stage)
+        print(line)
+    return regressions
+
+
+def main():
+    argument_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    argument_parser.add_argument('--fixtures', help='directory of recorded pages with a manifest.json')
+    argument_parser.add_argument('--record', metavar='DIR', help='download pages and save them as fixtures in DIR')
+    argument_parser.add_argument('--start', type=datetime.date.fromisoformat, default=datetime.date(2022, 4, 7),
+                                 help='first date to record or generate (default: %(default)s)')
+    argument_parser.add_argument('--days', type=int, default=3, help='number of dates to record or generate')
+    argument_parser.add_argument('--repeat', type=int, default=3, help='times each stage is run')
+    argument_parser.add_argument('--save-baseline', metavar='FILE', help='write the results to FILE')
+    argument_parser.add_argument('--baseline', metavar='FILE', help='compare against results saved in FILE')
+    argument_parser.add_argument('--tolerance', type=float, default=0.2,
+                                 help='fraction a p50 can get slower before it counts as a regression')
+    args = argument_parser.parse_args()
+    if args.record:
+        record_fixtures(args.record, args.start, args.days)
+        return
+    pages = load_fixtures(args.fixtures) if args.fixtures else synthetic_fixtures(args.start, args.days)
+    print(f'{len(pages)} pages, {sum(len(html) for html in pages.values()) / 1024 / 1024:.1f} MB, '
+          f'fragment parser: {box_scores.FRAGMENT_PARSER}')
+    results = run_stages(pages, args.repeat)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+    regressions = print_results(results, baseline, args.tolerance)
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as baseline_file:
+            json.dump(results, baseline_file, indent=1)
+    if regressions:
+        sys.exit('Slower than the baseline: ' + ', '.join(regressions))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Builds synthetic pages with the same structure as the BBRef and ESPN pages the webscraper reads, for benchmarking
+when no recorded pages are available. Box score pages are padded with filler tables (including some inside HTML
+comments, like BBRef does) so they're about the size of the real thing.
+"""
+
+import datetime
+import random
+
+TEAMS = [('BOS', 'BOS', 'Boston Red Sox'), ('BAL', 'BAL', 'Baltimore Orioles'), ('TBR', 'TBA', 'Tampa Bay Rays'),
+         ('TOR', 'TOR', 'Toronto Blue Jays'), ('NYY', 'NYA', 'New York Yankees'), ('CHW', 'CHA', 'Chicago White Sox'),
+         ('KCR', 'KCA', 'Kansas City Royals'), ('DET', 'DET', 'Detroit Tigers'), ('MIN', 'MIN', 'Minnesota Twins'),
+         ('CLE', 'CLE', 'Cleveland Guardians'), ('OAK', 'OAK', 'Oakland Athletics'), ('HOU', 'HOU', 'Houston Astros'),
+         ('SEA', 'SEA', 'Seattle Mariners'), ('LAA', 'ANA', 'Los Angeles Angels'), ('TEX', 'TEX', 'Texas Rangers'),
+         ('ATL', 'ATL', 'Atlanta Braves'), ('MIA', 'MIA', 'Miami Marlins'), ('PHI', 'PHI', 'Philadelphia Phillies'),
+         ('NYM', 'NYN', 'New York Mets'), ('WAS', 'WAS', 'Washington Nationals'), ('CHC', 'CHN', 'Chicago Cubs'),
+         ('STL', 'SLN', 'St. Louis Cardinals'), ('CIN', 'CIN', 'Cincinnati Reds'), ('MIL', 'MIL', 'Milwaukee Brewers'),
+         ('PIT', 'PIT', 'Pittsburgh Pirates'), ('LAD', 'LAN', 'Los Angeles Dodgers'), ('SDP', 'SDN', 'San Diego Padres'),
+         ('SFG', 'SFN', 'San Francisco Giants'), ('COL', 'COL', 'Colorado Rockies'), ('ARI', 'ARI', 'Arizona Diamondbacks')]
+
+
+def slate(game_date, games=15, seed=None):
+    '''Returns a list of (away, home, game ID, start time) for a made-up day of games'''
+    rng = random.Random(seed if seed is not None else game_date.toordinal())
+    teams = TEAMS[:]
+    rng.shuffle(teams)
+    slate_games = []
+    for number in range(min(games, len(teams) // 2)):
+        away, home = teams[2 * number], teams[2 * number + 1]
+        game_id = home[1] + game_date.strftime('%Y%m%d') + '0'
+        start_time = f'{rng.choice([1, 4, 6, 7, 8, 9])}:{rng.choice(["05", "10", "35", "40"])} p.m.'
+        slate_games.append((away, home, game_id, start_time))
+    return slate_games
+
+
+def linescore_runs(rng, innings):
+    return [rng.choice([0, 0, 0, 0, 1, 1, 2, 3]) for _ in range(innings)]
+
+
+def box_score_page(away, home, game_date, start_time, seed=0, filler_tables=40):
+    '''Returns the html of a box score page for a made-up game between away and home'''
+    rng = random.Random(seed)
+    innings = rng.choice([9] * 8 + [10, 11])
+    away_runs = linescore_runs(rng, innings)
+    home_runs = linescore_runs(rng, innings)
+    # The home team doesn't bat in the bottom of the last inning if it's already ahead
+    home_cells = [str(run) for run in home_runs]
+    if sum(home_runs[:-1]) > sum(away_runs):
+        home_cells[-1] = 'X'
+        home_runs[-1] = 0
+    header = ''.join(f'<th>{inning + 1}</th>' for inning in range(innings))
+
+    def row(team, cells, runs):
+        tds = ''.join(f'<td class="center">{cell}</td>' for cell in cells)
+        return (f'<tr><td class="center"><a href="/teams/{team[0]}/2022.shtml"><img class="teamlogo" src="x.png">'
+                f'</a></td><td><a href="/previews/">Prev Game</a> <a href="/teams/{team[0]}/2022.shtml">{team[2]}</a>'
+                f'</td>{tds}<td class="center">{sum(runs)}</td><td class="center">{rng.randint(3, 14)}</td>'
+                f'<td class="center">{rng.randint(0, 2)}</td></tr>')
+
+    linescore = ('<table class="linescore nohover stats_table no_freeze"><thead><tr><th></th><th></th>' + header +
+                 '<th>R</th><th>H</th><th>E</th></tr></thead><tbody>' + row(away, away_runs, away_runs) +
+                 row(home, home_cells, home_runs) + '</tbody></table>')
+    meta = ('<div class="scorebox_meta"><div>' + game_date.strftime('%A, %B %-d, %Y') + '</div>'
+            f'<div>Start Time: {start_time} Local</div><div>Attendance: {rng.randint(9000, 48000):,}</div>'
+            f'<div>Venue: {home[2].split()[-1]} Park</div><div>Game Duration: 3:{rng.randint(0, 59):02d}</div>'
+            '<div>Night Game, on grass</div></div>')
+    # Batting and pitching tables for both teams, inside comments like on BBRef
+    stat_tables = []
+    for team, runs in ((away, away_runs), (home, home_runs)):
+        table_id = ''.join(character for character in team[2] if character.isalnum())
+        batters = ''.join(f'<tr><th scope="row" class="left" data-stat="player"><a href="/players/x/b{number}.shtml">'
+                          f'{team[0]} Batter {number}</a> {rng.choice(["C", "1B", "SS", "CF", "RF"])}</th>'
+                          f'<td data-stat="AB">{rng.randint(2, 5)}</td><td data-stat="R">{rng.randint(0, 2)}</td>'
+                          f'<td data-stat="H">{rng.randint(0, 3)}</td><td data-stat="RBI">{rng.randint(0, 3)}</td>'
+                          f'<td data-stat="BB">{rng.randint(0, 2)}</td><td data-stat="SO">{rng.randint(0, 3)}</td>'
+                          f'<td data-stat="PA">{rng.randint(3, 6)}</td><td data-stat="batting_avg">.250</td></tr>'
+                          for number in range(1, 10))
+        pitchers = ''.join(f'<tr><th scope="row" class="left" data-stat="player"><a href="/players/x/p{number}.shtml">'
+                           f'{team[0]} Pitcher {number}</a></th><td data-stat="IP">{rng.randint(0, 6)}.'
+                           f'{rng.randint(0, 2)}</td><td data-stat="H">{rng.randint(0, 8)}</td>'
+                           f'<td data-stat="R">{rng.randint(0, 4)}</td><td data-stat="ER">{rng.randint(0, 4)}</td>'
+                           f'<td data-stat="BB">{rng.randint(0, 3)}</td><td data-stat="SO">{rng.randint(0, 9)}</td>'
+                           f'<td data-stat="HR">{rng.randint(0, 2)}</td>'
+                           f'<td data-stat="batters_faced">{rng.randint(3, 27)}</td></tr>' for number in range(1, 4))
+        totals = f'<tfoot><tr><th data-stat="player">Team Totals</th><td data-stat="R">{sum(runs)}</td></tr></tfoot>'
+        stat_tables.append(f'<!--\n<table class="sortable stats_table" id="{table_id}batting"><tbody>{batters}'
+                           f'<tr class="spacer"><td></td></tr></tbody>{totals}</table>\n-->')
+        stat_tables.append(f'<!--\n<table class="sortable stats_table" id="{table_id}pitching"><tbody>{pitchers}'
+                           f'</tbody>{totals}</table>\n-->')
+    filler = stat_tables
+    for table_number in range(filler_tables):
+        rows = ''.join('<tr>' + ''.join(f'<td class="right" data-stat="s{column}">{rng.randint(0, 40)}</td>'
+                                        for column in range(22)) + '</tr>' for _ in range(12))
+        table = (f'<div class="table_wrapper" id="all_t{table_number}"><div class="section_heading"><h2>Table '
+                 f'{table_number}</h2></div><div class="table_container"><table class="stats_table" id="t{table_number}">'
+                 f'<tbody>{rows}</tbody></table></div></div>')
+        # BBRef ships most of the tables below the linescore inside HTML comments
+        filler.append(f'<!--\n{table}\n-->' if table_number % 2 else table)
+    return ('<!DOCTYPE html><html><head><title>Box Score</title></head><body><div id="wrap"><div id="content">'
+            '<div class="scorebox"><div><strong><a href="/teams/">' + away[2] + '</a></strong></div>' + meta +
+            '</div><div class="linescore_wrap">' + linescore + '</div>' + ''.join(filler) +
+            '</div></div></body></html>')
+
+
+def boxes_index_page(game_date, games):
+    '''Returns the html of the BBRef scores page (/boxes/?year=...) for a list of games from slate()'''
+    summaries = []
+    for away, home, game_id, _ in games:
+        summaries.append('<div class="game_summary nohover"><table class="teams"><tbody>'
+                         f'<tr class="loser"><td><a href="/teams/{away[0]}/2022.shtml">{away[2]}</a></td>'
+                         '<td class="right">3</td><td class="right gamelink">'
+                         f'<a href="/boxes/{home[1]}/{game_id}.shtml">Final</a></td></tr>'
+                         f'<tr class="winner"><td><a href="/teams/{home[0]}/2022.shtml">{home[2]}</a></td>'
+                         '<td class="right">5</td><td class="right"></td></tr></tbody></table></div>')
+    return ('<html><body><div id="content"><div class="prevnext"><span class="button2 current">' +
+            game_date.strftime('%b %-d, %Y') + '</span></div><div class="game_summaries">' + ''.join(summaries) +
+            '</div></div></body></html>')
+
+
+def schedule_page(first_date, days, games_per_day=15):
+    '''Returns the html of a BBRef season schedule page covering days dates starting at first_date'''
+    date_divs = []
+    for offset in range(days):
+        game_date = first_date + datetime.timedelta(days=offset)
+        games = ''.join(f'<p class="game"><strong><span tz="E">{start_time[:-5]} pm</span></strong> '
+                        f'<a href="/teams/{away[0]}/2022.shtml">{away[2]}</a> @ '
+                        f'<a href="/teams/{home[0]}/2022.shtml">{home[2]}</a> '
+                        f'<span><em><a href="/previews/{game_id}.shtml">Preview</a></em></span></p>'
+                        for away, home, game_id, start_time in slate(game_date, games_per_day))
+        date_divs.append('<div><h3>' + game_date.strftime('%A, %B %-d, %Y') + '</h3>' + games + '</div>')
+    return ('<html><body><div id="wrap"><div id="info"><div class="notes"><ul><li>all times Eastern</li></ul></div>'
+            '<div class="section_wrapper">' + ''.join(date_divs) + '</div></div></div></body></html>')
+
+
+def espn_scoreboard_page(game_date, postponed=()):
+    '''Returns the html of an ESPN scoreboard for a date, with postponed as a list of (away, home) mascot pairs'''
+    sections = []
+    for away_mascot, home_mascot in postponed:
+        makeup = game_date + datetime.timedelta(days=1)
+        sections.append('<section class="Scoreboard bg-clr-white flex flex-auto justify-between"><div>'
+                        f'<div>{away_mascot}</div><div>{home_mascot}</div>'
+                        f'<div>Postponed - Makeup {makeup.strftime("%b")} {makeup.day}</div></div></section>')
+    for away, home, _, _ in slate(game_date, 13):
+        sections.append('<section class="Scoreboard bg-clr-white flex flex-auto justify-between"><div>'
+                        f'<div>{away[2].split()[-1]}</div><div>{home[2].split()[-1]}</div><div>Final</div>'
+                        '</div></section>')
+    return '<html><body>' + ''.join(sections) + '</body></html>'
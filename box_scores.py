@@ -0,0 +1,408 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Parsing of BBRef box score pages.
+
+A box score page is 500KB+ of html, but the scores only need the linescore table (the away and home rows) and the
+start time from the scorebox_meta div. parse_box_score_fast cuts just those two pieces out of the page with a quick
+string scan and only builds a BeautifulSoup tree for them (with lxml if it's installed), instead of building a tree
+of the whole page like parse_box_score_full does. Both return exactly the same values.
+
+parse_box_score_record pulls everything else the scraper keeps from the same page in the same way: the attendance,
+venue and duration from scorebox_meta, and every player's line from the batting and pitching tables (including the
+ones BBRef hides inside HTML comments), as a BoxScore record.
+
+parse_box_score_content does either parse from the raw bytes of a page and hands back only the parsed tuples, so it can
+be run in a pool of worker processes without pickling any soup objects or DataFrames.
+
+parse_game gives a game as a compact Game record: two Linescores whose innings are an array('h') of runs and whose
+R, H and E are ints, all in __slots__ classes, so a season of games held in memory is a few hundred bytes a game
+rather than lists of strings or small DataFrames. LinescoreAccumulator collects the linescores of many games into
+preallocated NumPy arrays and builds the scores DataFrame once at the end, which is the only place a DataFrame is made.
+"""
+
+import re
+import time
+from array import array
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+from bs4 import BeautifulSoup
+
+# Uses lxml for the small fragments if it's available since it's the fastest parser BeautifulSoup supports
+try:
+    import lxml  # noqa: F401
+    FRAGMENT_PARSER = 'lxml'
+except ImportError:
+    FRAGMENT_PARSER = 'html.parser'
+
+# Patterns used to find the start of the two pieces of the page the scores need
+LINESCORE_START = re.compile(r'<table[^>]*class="linescore')
+SCOREBOX_META_START = re.compile(r'<div[^>]*class="scorebox_meta"')
+DIV_TAG = re.compile(r'<(/?)div\b')
+# Start of the batting and pitching tables (e.g. id="NewYorkYankeesbatting"). BBRef puts most of them inside HTML
+# comments, which doesn't matter here since the page is scanned as text rather than parsed.
+STAT_TABLE_START = re.compile(r'<table[^>]*\bid="([A-Za-z0-9]+)(batting|pitching)"')
+
+# One player's line in a batting or pitching table. Stats that are blank on BBRef are None. Outs is the innings
+# pitched as a number of outs (6.1 IP is 19 outs).
+BattingLine = namedtuple('BattingLine', ['player', 'AB', 'R', 'H', 'RBI', 'BB', 'SO', 'PA'])
+PitchingLine = namedtuple('PitchingLine', ['player', 'outs', 'H', 'R', 'ER', 'BB', 'SO', 'HR', 'BF'])
+# Everything the scraper keeps from a box score page. The first five fields are the same as parse_box_score returns.
+# Attendance and duration (in minutes) are ints, and each batting/pitching field is a list of lines in the order
+# BBRef lists the players.
+BoxScore = namedtuple('BoxScore', ['away_team', 'away_cells', 'home_team', 'home_cells', 'start_time', 'game_id',
+                                   'attendance', 'venue', 'duration', 'away_batting', 'home_batting',
+                                   'away_pitching', 'home_pitching'])
+# data-stat names of the columns kept from each kind of table
+BATTING_STATS = ('AB', 'R', 'H', 'RBI', 'BB', 'SO', 'PA')
+PITCHING_STATS = ('IP', 'H', 'R', 'ER', 'BB', 'SO', 'HR', 'batters_faced')
+
+
+def parse(list):
+    '''Converts a list of beautifulsoup strings to a list of Python strings'''
+    return [str(x.string) for x in list]
+
+
+def linescore_row(tr):
+    '''Returns the team name and the list of inning-by-inning, R, H, E cells for one row of the linescore'''
+    # The last link in the row is the team's name. Cells without a single string (like the logo cell) come out
+    # as 'None' and are removed.
+    team = parse(tr.find_all('a'))[-1]
+    cells = [td for td in parse(tr.find_all('td', {'class': 'center'})) if td != 'None']
+    return team, cells
+
+
+def linescore_record(tr):
+    '''Returns one row of the linescore as a Linescore, without building a list of strings for it first'''
+    # Same cells as linescore_row: the ones without a single string (like the logo cell) are skipped
+    team = str(tr.find_all('a')[-1].string)
+    values = [DID_NOT_BAT if td.string == 'X' else int(td.string)
+              for td in tr.find_all('td', {'class': 'center'}) if td.string is not None]
+    return Linescore(team, array('h', values[:-3]), *values[-3:])
+
+
+def scorebox_start_time(scorebox_meta):
+    '''Returns the local start time text (e.g. 7:05 p.m.) from the scorebox_meta div'''
+    parsed_scorebox_meta = parse(scorebox_meta.find_all('div'))
+    start_time = [item for item in parsed_scorebox_meta if 'Start Time' in item]
+    start_time = start_time[0].split('Start Time: ')[1]
+    return start_time.split(' Local')[0]
+
+
+def parse_box_score_full(html):
+    '''Parses a box score page by building a tree of the whole page, the way the scraper originally did'''
+    # Returns (away team, away cells, home team, home cells, start time text)
+    game_soup = BeautifulSoup(html, features="html.parser")
+    tr = game_soup.find_all('tr')
+    away_team, away_cells = linescore_row(tr[1])
+    home_team, home_cells = linescore_row(tr[2])
+    start_time = scorebox_start_time(game_soup.find_all('div', {'class': 'scorebox_meta'})[0])
+    return away_team, away_cells, home_team, home_cells, start_time
+
+
+def linescore_fragment(html):
+    '''Returns the html of just the linescore table, or None if it can't be found'''
+    match = LINESCORE_START.search(html)
+    if match is None:
+        return None
+    end = html.find('</table>', match.start())
+    if end == -1:
+        return None
+    return html[match.start():end + len('</table>')]
+
+
+def scorebox_meta_fragment(html):
+    '''Returns the html of just the scorebox_meta div (including the divs inside it), or None if it can't be found'''
+    match = SCOREBOX_META_START.search(html)
+    if match is None:
+        return None
+    # Walks the opening and closing div tags after the start of scorebox_meta until they balance out
+    depth = 0
+    for div_tag in DIV_TAG.finditer(html, match.start()):
+        depth += -1 if div_tag.group(1) else 1
+        if depth == 0:
+            return html[match.start():html.find('>', div_tag.end()) + 1]
+    return None
+
+
+def box_score_trees(html):
+    '''Returns the linescore's rows and the scorebox_meta div of a box score page, only building trees of those two pieces'''
+    # Falls back to a tree of the whole page if the page isn't laid out the way it's expected to be
+    linescore = linescore_fragment(html)
+    scorebox_meta = scorebox_meta_fragment(html)
+    if linescore is None or scorebox_meta is None:
+        game_soup = BeautifulSoup(html, features="html.parser")
+        return game_soup.find_all('tr'), game_soup.find_all('div', {'class': 'scorebox_meta'})[0]
+    linescore_soup = BeautifulSoup(linescore, features=FRAGMENT_PARSER)
+    meta_soup = BeautifulSoup(scorebox_meta, features=FRAGMENT_PARSER)
+    return linescore_soup.find_all('tr'), meta_soup.find_all('div', {'class': 'scorebox_meta'})[0]
+
+
+def parse_box_score_fast(html):
+    '''Parses a box score page by only building trees of the linescore table and the scorebox_meta div'''
+    # Returns the same values as parse_box_score_full
+    tr, scorebox_meta = box_score_trees(html)
+    away_team, away_cells = linescore_row(tr[1])
+    home_team, home_cells = linescore_row(tr[2])
+    return away_team, away_cells, home_team, home_cells, scorebox_start_time(scorebox_meta)
+
+
+# The parser used by the scraper
+parse_box_score = parse_box_score_fast
+
+
+def parse_game(html, game_id=None):
+    '''Parses a box score page into a Game record, building trees of only the linescore and scorebox_meta like parse_box_score_fast'''
+    tr, scorebox_meta = box_score_trees(html)
+    return Game(game_id, start_time_number(scorebox_start_time(scorebox_meta)), linescore_record(tr[1]),
+                linescore_record(tr[2]))
+
+
+def stat_number(text):
+    '''Converts a stat cell to an int (or None if it's blank), removing commas'''
+    text = text.strip().replace(',', '')
+    return int(text) if text.lstrip('-').isdigit() else None
+
+
+def innings_to_outs(text):
+    '''Converts innings pitched (e.g. 6.1, meaning 6 and 1/3) into a number of outs'''
+    text = text.strip()
+    if not text:
+        return None
+    whole, _, thirds = text.partition('.')
+    return int(whole) * 3 + int(thirds or 0)
+
+
+def stat_table_lines(table_html, kind):
+    '''Returns the BattingLines or PitchingLines in the html of a batting or pitching table'''
+    table = BeautifulSoup(table_html, features=FRAGMENT_PARSER)
+    lines = []
+    # The team totals are in the table's footer, so only the body's rows are players
+    for tr in table.select('tbody tr'):
+        player_cell = tr.find('th', {'data-stat': 'player'})
+        # Spacer and repeated header rows have no player
+        if player_cell is None or 'spacer' in (tr.get('class') or []) or 'thead' in (tr.get('class') or []):
+            continue
+        # The player's name is the link (the rest of the cell is their position or the decision)
+        link = player_cell.find('a')
+        player = (link or player_cell).get_text().strip()
+        cells = {td.get('data-stat'): td.get_text() for td in tr.find_all('td')}
+        if kind == 'batting':
+            lines.append(BattingLine(player, *(stat_number(cells.get(stat, '')) for stat in BATTING_STATS)))
+        else:
+            lines.append(PitchingLine(player, innings_to_outs(cells.get('IP', '')),
+                                      *(stat_number(cells.get(stat, '')) for stat in PITCHING_STATS[1:])))
+    return lines
+
+
+def stat_tables(html):
+    '''Returns {(team id, 'batting' or 'pitching'): lines} for every batting and pitching table on the page'''
+    tables = {}
+    for match in STAT_TABLE_START.finditer(html):
+        end = html.find('</table>', match.start())
+        if end == -1:
+            continue
+        key = (match.group(1), match.group(2))
+        # Only the first table with each id is used
+        if key not in tables:
+            tables[key] = stat_table_lines(html[match.start():end + len('</table>')], match.group(2))
+    return tables
+
+
+def team_table_id(team_name):
+    '''Returns how BBRef writes a team's name in its table ids (e.g. New York Yankees -> NewYorkYankees)'''
+    return re.sub(r'[^A-Za-z0-9]', '', team_name)
+
+
+def scorebox_details(scorebox_meta):
+    '''Returns the attendance, venue and duration (in minutes) from the scorebox_meta div (None for any missing)'''
+    attendance = venue = duration = None
+    for div in scorebox_meta.find_all('div'):
+        text = div.get_text().strip()
+        if text.startswith('Attendance'):
+            attendance = stat_number(text.split(':', 1)[1])
+        elif text.startswith('Venue'):
+            venue = text.split(':', 1)[1].strip()
+        elif text.startswith('Game Duration'):
+            hours, _, minutes = text.split(':', 1)[1].strip().partition(':')
+            duration = int(hours) * 60 + int(minutes) if hours.isdigit() and minutes.isdigit() else None
+    return attendance, venue, duration
+
+
+def parse_box_score_record(html, game_id=None):
+    '''Parses everything the scraper keeps from a box score page (linescore, game details, batting and pitching) into a BoxScore'''
+    # Like parse_box_score_fast, only the pieces of the page that are needed are built into trees, all from the
+    # one download of the page
+    tr, scorebox_meta = box_score_trees(html)
+    away_team, away_cells = linescore_row(tr[1])
+    home_team, home_cells = linescore_row(tr[2])
+    start_time = scorebox_start_time(scorebox_meta)
+    details = scorebox_details(scorebox_meta)
+    tables = stat_tables(html)
+    away_id, home_id = team_table_id(away_team), team_table_id(home_team)
+    return BoxScore(away_team, away_cells, home_team, home_cells, start_time, game_id, *details,
+                    tables.get((away_id, 'batting'), []), tables.get((home_id, 'batting'), []),
+                    tables.get((away_id, 'pitching'), []), tables.get((home_id, 'pitching'), []))
+
+
+def parse_box_score_content(content, encoding=None, game_id=None, full_record=False):
+    '''Parses the raw bytes of a box score page and returns the Game (or BoxScore) along with how long the parse took'''
+    # Used by the parse worker processes, which are sent the page's bytes and send back a Game record (or a BoxScore
+    # if full_record is True) and the seconds spent, so the time can be recorded in the main process
+    start = time.perf_counter()
+    html = content.decode(encoding or 'utf-8', errors='replace')
+    box_score = parse_box_score_record(html, game_id) if full_record else parse_game(html, game_id)
+    return box_score, time.perf_counter() - start
+
+
+def start_time_number(start_time):
+    '''Converts a local start time (e.g. 7:05 p.m.) into a number used to sort games, so that doubleheaders are in order'''
+    # Noon and morning starts are moved below the afternoon/evening ones (12 -> 0, 11 -> -1, 10 -> -2)
+    start_time_minutes = int(start_time.split(':')[1][:2]) / 60
+    start_time_hour = int(start_time.split(':')[0])
+    if start_time_hour == 12:
+        start_time_hour = 0
+    elif start_time_hour == 11:
+        start_time_hour = -1
+    elif start_time_hour == 10:
+        start_time_hour = -2
+    return start_time_hour + start_time_minutes
+
+
+# Markers stored in the innings array for half innings that don't have a number of runs. Both are shown as '-'.
+DID_NOT_BAT = -1
+NOT_PLAYED = -2
+# The most innings a linescore is expected to have. Longer games make the innings array grow.
+MAX_INNINGS = 26
+
+
+class Linescore:
+    '''One team's linescore: the runs in each half inning (DID_NOT_BAT for an 'X') and the team's R, H and E'''
+    __slots__ = ('team', 'innings', 'runs', 'hits', 'errors')
+
+    def __init__(self, team, innings, runs, hits, errors):
+        self.team = team
+        self.innings = innings
+        self.runs = runs
+        self.hits = hits
+        self.errors = errors
+
+    @classmethod
+    def from_cells(cls, team, cells):
+        '''Builds a Linescore from the inning-by-inning, R, H, E cells as they're shown on BBRef (e.g. '2', 'X')'''
+        innings = array('h', [DID_NOT_BAT if cell == 'X' else int(cell) for cell in cells[:-3]])
+        return cls(team, innings, int(cells[-3]), int(cells[-2]), int(cells[-1]))
+
+    def __eq__(self, other):
+        return isinstance(other, Linescore) and all(getattr(self, name) == getattr(other, name)
+                                                    for name in self.__slots__)
+
+    def __repr__(self):
+        return f'Linescore({self.team!r}, {self.innings.tolist()}, {self.runs}, {self.hits}, {self.errors})'
+
+
+class Game:
+    '''A game's BBRef game ID, start time (as a start_time_number) and both teams' Linescores'''
+    __slots__ = ('game_id', 'start_time', 'away', 'home')
+
+    def __init__(self, game_id, start_time, away, home):
+        self.game_id = game_id
+        self.start_time = start_time
+        self.away = away
+        self.home = home
+
+    @classmethod
+    def from_cells(cls, game_id, away_team, away_cells, home_team, home_cells, start_time):
+        '''Builds a Game from the same values LinescoreAccumulator.add_game takes'''
+        return cls(game_id, start_time, Linescore.from_cells(away_team, away_cells),
+                   Linescore.from_cells(home_team, home_cells))
+
+    def __eq__(self, other):
+        return isinstance(other, Game) and all(getattr(self, name) == getattr(other, name)
+                                               for name in self.__slots__)
+
+    def __repr__(self):
+        return f'Game({self.game_id!r}, {self.start_time!r}, {self.away!r}, {self.home!r})'
+
+
+class LinescoreAccumulator:
+    '''Collects the linescores of many games into NumPy arrays and builds the scores DataFrame in one go'''
+
+    def __init__(self, capacity=32):
+        # Each game adds two rows (away then home). The arrays double in size whenever they fill up.
+        self.rows = 0
+        self.teams = []
+        self.game_ids = []
+        self.innings = np.full((capacity, MAX_INNINGS), NOT_PLAYED, dtype=np.int16)
+        self.rhe = np.zeros((capacity, 3), dtype=np.int16)
+        self.start_times = np.zeros(capacity, dtype=np.float64)
+        self.max_innings = 0
+
+    def __len__(self):
+        return self.rows // 2
+
+    def grow(self, rows_needed, innings_needed):
+        '''Makes the arrays big enough to hold rows_needed rows with innings_needed innings'''
+        capacity, inning_columns = self.innings.shape
+        if rows_needed <= capacity and innings_needed <= inning_columns:
+            return
+        new_capacity = max(capacity, 1)
+        while new_capacity < rows_needed:
+            new_capacity *= 2
+        innings = np.full((new_capacity, max(inning_columns, innings_needed)), NOT_PLAYED, dtype=np.int16)
+        innings[:self.rows, :inning_columns] = self.innings[:self.rows]
+        self.innings = innings
+        rhe = np.zeros((new_capacity, 3), dtype=np.int16)
+        rhe[:self.rows] = self.rhe[:self.rows]
+        self.rhe = rhe
+        start_times = np.zeros(new_capacity, dtype=np.float64)
+        start_times[:self.rows] = self.start_times[:self.rows]
+        self.start_times = start_times
+
+    def add_row(self, linescore, start_time):
+        '''Stores one team's Linescore'''
+        row = self.rows
+        # The array('h') of innings is copied straight into the row without going through Python ints
+        self.innings[row, :len(linescore.innings)] = np.frombuffer(linescore.innings, dtype=np.int16)
+        self.rhe[row] = (linescore.runs, linescore.hits, linescore.errors)
+        self.start_times[row] = start_time
+        self.teams.append(linescore.team)
+        self.max_innings = max(self.max_innings, len(linescore.innings))
+        self.rows += 1
+
+    def add_record(self, game):
+        '''Stores both teams' linescores of a Game'''
+        self.grow(self.rows + 2, max(len(game.away.innings), len(game.home.innings)))
+        self.add_row(game.away, game.start_time)
+        self.add_row(game.home, game.start_time)
+        self.game_ids.extend([game.game_id, game.game_id])
+
+    def add_game(self, game_id, away_team, away_cells, home_team, home_cells, start_time):
+        '''Stores both teams' linescores for a game, where the cells are the inning-by-inning runs followed by R, H and E'''
+        self.add_record(Game.from_cells(game_id, away_team, away_cells, home_team, home_cells, start_time))
+
+    def to_frame(self):
+        '''Builds the scores DataFrame: 1st5 R, Total R, each inning, Local Start Time, Game ID, R, H, E'''
+        innings = self.innings[:self.rows, :self.max_innings]
+        # Half innings that weren't batted (or weren't played) count as no runs in the totals
+        runs = np.where(innings >= 0, innings, 0)
+        columns = {'1st5 R': runs[:, :5].sum(axis=1), 'Total R': self.rhe[:self.rows, 0].astype(np.int64)}
+        for inning in range(self.max_innings):
+            column = innings[:, inning].astype(object)
+            column[innings[:, inning] < 0] = '-'
+            columns[str(inning + 1)] = column
+        columns['Local Start Time'] = self.start_times[:self.rows]
+        columns['Game ID'] = self.game_ids
+        for position, label in enumerate(('R', 'H', 'E')):
+            columns[label] = self.rhe[:self.rows, position].astype(np.int64)
+        return pd.DataFrame(columns, index=self.teams)
+
+
+def games_frame(games):
+    '''Builds the scores DataFrame of a list of Games'''
+    accumulator = LinescoreAccumulator(capacity=max(2 * len(games), 1))
+    for game in games:
+        accumulator.add_record(game)
+    return accumulator.to_frame()
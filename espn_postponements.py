@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Scanner of ESPN's MLB scoreboards for postponed games.
+
+BBRef is sometimes slow to put postponed games back on the schedule, so the webscraper checks ESPN's scoreboard for
+games that were postponed and when they'll be made up. scan_postponements goes through a range of dates (of any
+year), fetching each date's scoreboard once through the response cache, and returns one Postponement record per
+postponed game:
+    Postponement(original_date, makeup_date, away, home)
+where away and home are team mascots (e.g. Yankees, Red Sox) as ESPN shows them.
+
+Only the scoreboard's game sections are parsed, and each game's text is gone through once: team names are looked up
+in a set and the makeup date is the first date after the game's postponement note (e.g. Postponed - Makeup Apr 8), so
+dates anywhere else in a game's text aren't taken for one. In a fetch_run (http_cache.py) each scoreboard is
+only parsed once, so a range scan and a check of one of its dates share the parse.
+"""
+
+import calendar
+import datetime
+import re
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+from http_cache import cached_parse
+from metrics import timed
+
+ESPN_SCOREBOARD_URL = 'https://www.espn.com/mlb/scoreboard/_/date/'
+SCOREBOARD_SECTION_CLASS = 'Scoreboard bg-clr-white flex flex-auto justify-between'
+# Every team's mascot the way ESPN writes it on the scoreboard
+ESPN_MASCOTS = frozenset(['Red Sox', 'Orioles', 'Rays', 'Blue Jays', 'Yankees', 'White Sox', 'Royals', 'Tigers',
+                          'Twins', 'Guardians', 'Angels', 'Astros', 'Mariners', 'Athletics', 'Rangers', 'Mets',
+                          'Phillies', 'Nationals', 'Braves', 'Marlins', 'Brewers', 'Cardinals', 'Pirates', 'Cubs',
+                          'Reds', 'Dodgers', 'Giants', 'Padres', 'Rockies', 'Diamondbacks'])
+# ESPN writes makeup dates like "Apr 8", "June 3" or "Sept 12"
+MONTH_NUMBERS = {name.lower(): number for number, name in enumerate(calendar.month_abbr) if name}
+# The note on a postponed game that its makeup date follows
+POSTPONEMENT_NOTE = re.compile(r'\b(?:Postponed|Make-?up|Rescheduled)\b', re.IGNORECASE)
+MAKEUP_DATE = re.compile(r'\b(Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)[a-z]*\.? (\d{1,2})\b')
+# Maximum number of scoreboards downloaded at once when scanning several dates
+MAX_SCAN_WORKERS = 4
+
+Postponement = namedtuple('Postponement', ['original_date', 'makeup_date', 'away', 'home'])
+
+
+def scoreboard_url(day):
+    '''Returns the link to ESPN's MLB scoreboard for a datetime.date'''
+    return ESPN_SCOREBOARD_URL + day.strftime('%Y%m%d')
+
+
+def makeup_date(text, day):
+    '''Returns the first date after day that follows the postponement note in text (e.g. Postponed - Makeup Apr 8)'''
+    # None if there's no note or no such date
+    note = POSTPONEMENT_NOTE.search(text)
+    if note is None:
+        return None
+    for match in MAKEUP_DATE.finditer(text, note.end()):
+        month = MONTH_NUMBERS[match.group(1).lower()]
+        # A makeup date in an earlier month than the game is in the next year (a December game made up in January)
+        year = day.year + 1 if month < day.month else day.year
+        try:
+            found = datetime.date(year, month, int(match.group(2)))
+        except ValueError:
+            continue
+        if found > day:
+            return found
+    return None
+
+
+def scoreboard_postponements(html, day):
+    '''Returns the Postponements on the ESPN scoreboard page (html) for a datetime.date'''
+    # Only the game sections are built into a tree, not the rest of the page
+    sections = BeautifulSoup(html, features="html.parser",
+                             parse_only=SoupStrainer('section', {'class': SCOREBOARD_SECTION_CLASS}))
+    postponements = []
+    for section in sections.find_all('section', {'class': SCOREBOARD_SECTION_CLASS}):
+        # Each game's text is pulled out once and used for both the teams and the makeup date
+        tokens = [str(div.string) for div in section.find_all('div') if div.string is not None]
+        teams = []
+        for token in tokens:
+            if token in ESPN_MASCOTS and token not in teams:
+                teams.append(token)
+        makeup = makeup_date(' '.join(tokens), day)
+        if makeup is not None and len(teams) >= 2:
+            postponements.append(Postponement(day, makeup, teams[0], teams[1]))
+    return postponements
+
+
+def day_postponements(day):
+    '''Returns the Postponements on ESPN's scoreboard for a datetime.date, only parsing it once in a fetch_run'''
+    def parse_scoreboard(response):
+        with timed('parse_espn'):
+            return scoreboard_postponements(response.text, day)
+    return cached_parse(scoreboard_url(day), 'postponements', parse_scoreboard)
+
+
+def scan_postponements(start, end, max_workers=MAX_SCAN_WORKERS):
+    '''Returns the Postponements of every date from start to end (datetime.dates, inclusive), in date order'''
+    days = [start + datetime.timedelta(days=offset) for offset in range((end - start).days + 1)]
+    # Each date's scoreboard is downloaded and parsed once. executor.map keeps them in date order.
+    if max_workers <= 1 or len(days) <= 1:
+        day_lists = [day_postponements(day) for day in days]
+    else:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(days))) as executor:
+            day_lists = list(executor.map(day_postponements, days))
+    postponements = []
+    for day_list in day_lists:
+        postponements += day_list
+    return postponements
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Local SQLite store of scraped schedules and linescores.
+
+Every schedule and every day of scores the scraper pulls is saved here, so questions about past games (e.g. every CHC
+game in June with more than 5 first five runs) can be answered without scraping again:
+    games        - one row per game: BBRef game ID, date, away and home teams, start time
+    linescores   - one row per team per game: the inning-by-inning cells, R/H/E and first five runs
+    scores_dates - one row per date of scores saved, with whether the date is complete
+    schedule     - one row per game on BBRef's schedule for a date, with the game ID from its box score/preview link
+    schedule_blocks - one row per date on BBRef's current schedule page as of the last check for schedule changes:
+                      a hash of the date's block of the page and its games, which the next check is compared to
+Games are indexed by date, away team, home team and game ID, and linescores by team. Saving is an upsert keyed on the
+game ID (or the date, for schedules), so scraping the same date again just replaces what was there.
+
+A date's scores are complete once the BBRef scores page was actually for that date (BBRef redirects dates it doesn't
+have yet to an earlier one), every game on it was final (or postponed) and the date is before yesterday. get_scores
+is served straight from the store for complete dates. get_scores(refresh=True) scrapes a date again whatever the
+store has, and forget_scores drops a date so the next get_scores scrapes it.
+"""
+
+import datetime
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import pandas as pd
+
+from box_scores import LinescoreAccumulator
+
+# Where the store lives. Can be overridden with the BBREF_STORE_PATH environment variable.
+STORE_PATH = os.environ.get('BBREF_STORE_PATH', os.path.join(os.path.expanduser('~'), '.bbref_games.sqlite3'))
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS games (game_id TEXT PRIMARY KEY, date TEXT NOT NULL, away TEXT, home TEXT,
+                                  start_time REAL, position INTEGER);
+CREATE INDEX IF NOT EXISTS games_date ON games (date);
+CREATE INDEX IF NOT EXISTS games_away ON games (away, date);
+CREATE INDEX IF NOT EXISTS games_home ON games (home, date);
+CREATE TABLE IF NOT EXISTS linescores (game_id TEXT NOT NULL, home INTEGER NOT NULL, team TEXT, cells TEXT,
+                                       first5_runs INTEGER, runs INTEGER, hits INTEGER, errors INTEGER,
+                                       PRIMARY KEY (game_id, home));
+CREATE INDEX IF NOT EXISTS linescores_team ON linescores (team);
+CREATE TABLE IF NOT EXISTS scores_dates (date TEXT PRIMARY KEY, page_date TEXT, games INTEGER, complete INTEGER,
+                                         saved_at REAL);
+CREATE TABLE IF NOT EXISTS schedule (date TEXT NOT NULL, position INTEGER NOT NULL, game_id TEXT, away TEXT,
+                                     home TEXT, time TEXT, title TEXT, PRIMARY KEY (date, position));
+CREATE INDEX IF NOT EXISTS schedule_away ON schedule (away, date);
+CREATE INDEX IF NOT EXISTS schedule_home ON schedule (home, date);
+CREATE INDEX IF NOT EXISTS schedule_game_id ON schedule (game_id);
+CREATE TABLE IF NOT EXISTS schedule_blocks (title TEXT PRIMARY KEY, block_hash TEXT, games TEXT, saved_at REAL);
+'''
+
+
+class GameStore:
+    '''SQLite-backed store of schedules and linescores'''
+
+    def __init__(self, path=STORE_PATH):
+        self.path = path
+        self.lock = threading.Lock()
+        # The connection is shared between threads so every use of it goes through self.lock
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.executescript(SCHEMA)
+        self.connection.commit()
+
+    def save_scores(self, all_games_df, day, page_date, today=None):
+        '''Saves a scores DataFrame from get_scores for a datetime.date, replacing the games stored for the date'''
+        # page_date is the date shown on the BBRef page the scores came from (e.g. Apr 5, 2022), or None.
+        # all_games_df.attrs['all_final'] says whether every game on the page was final (or postponed).
+        today = today or datetime.date.today()
+        page_day = None if page_date is None else datetime.datetime.strptime(page_date, '%b %d, %Y').date()
+        # Scores from a page for a different date (BBRef redirecting) aren't this date's games
+        if page_day != day:
+            all_games_df = all_games_df.iloc[0:0]
+        game_rows = []
+        linescore_rows = []
+        if not all_games_df.empty:
+            inning_columns = [column for column in all_games_df.columns if column.isdigit()]
+            seen = {}
+            for position, (team, row) in enumerate(all_games_df.iterrows()):
+                game_id = row['Game ID']
+                home = game_id in seen
+                # Turns the DataFrame's cells back into the cells BBRef shows, trimming the '-' columns past the end
+                # of the game. A '-' inside the game is a half inning the team didn't bat in ('X' on BBRef).
+                cells = [str(row[column]) for column in inning_columns]
+                while cells and cells[-1] == '-':
+                    cells.pop()
+                linescore_rows.append([game_id, int(home), team, cells, int(row['1st5 R']), int(row['R']),
+                                       int(row['H']), int(row['E'])])
+                if not home:
+                    seen[game_id] = len(game_rows)
+                    game_rows.append([game_id, day.isoformat(), team, None, float(row['Local Start Time']),
+                                      position // 2])
+                else:
+                    game_rows[seen[game_id]][3] = team
+            # Both teams of a game have the same number of innings. The home team's last one is 'X' if they
+            # didn't bat in it.
+            innings = {}
+            for row in linescore_rows:
+                innings[row[0]] = max(innings.get(row[0], 0), len(row[3]))
+            for row in linescore_rows:
+                row[3] = json.dumps([cell if cell != '-' else 'X' for cell in row[3]] +
+                                    ['X'] * (innings[row[0]] - len(row[3])))
+        complete = int(page_day == day and bool(all_games_df.attrs.get('all_final'))
+                       and day < today - datetime.timedelta(days=1))
+        with self.lock, self.connection:
+            # Games that were taken off the date's page since it was last saved go, too
+            if page_day == day:
+                self.delete_games(day)
+            self.connection.executemany('INSERT INTO games VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (game_id) DO UPDATE '
+                                        'SET date = excluded.date, away = excluded.away, home = excluded.home, '
+                                        'start_time = excluded.start_time, position = excluded.position', game_rows)
+            self.connection.executemany('INSERT INTO linescores VALUES (?, ?, ?, ?, ?, ?, ?, ?) '
+                                        'ON CONFLICT (game_id, home) DO UPDATE SET team = excluded.team, '
+                                        'cells = excluded.cells, first5_runs = excluded.first5_runs, '
+                                        'runs = excluded.runs, hits = excluded.hits, errors = excluded.errors',
+                                        linescore_rows)
+            self.connection.execute('INSERT INTO scores_dates VALUES (?, ?, ?, ?, ?) ON CONFLICT (date) DO UPDATE '
+                                    'SET page_date = excluded.page_date, games = excluded.games, '
+                                    'complete = excluded.complete, saved_at = excluded.saved_at',
+                                    (day.isoformat(), page_date, len(game_rows), complete, time.time()))
+
+    def delete_games(self, day):
+        # Only called with self.lock held and inside a transaction
+        self.connection.execute('DELETE FROM linescores WHERE game_id IN (SELECT game_id FROM games WHERE date = ?)',
+                                (day.isoformat(),))
+        self.connection.execute('DELETE FROM games WHERE date = ?', (day.isoformat(),))
+
+    def forget_scores(self, day):
+        '''Deletes the stored scores of a datetime.date, so get_scores scrapes the date again'''
+        with self.lock, self.connection:
+            self.delete_games(day)
+            self.connection.execute('DELETE FROM scores_dates WHERE date = ?', (day.isoformat(),))
+
+    def save_schedule(self, full_df, day):
+        '''Replaces the stored schedule of a datetime.date with a schedule DataFrame from get_schedule'''
+        # The game IDs come from each game's box score or preview link (kept in attrs['game_ids'] by get_schedule)
+        game_ids = list(full_df.attrs.get('game_ids') or [])
+        game_ids += [None] * (len(full_df) - len(game_ids))
+        rows = [(day.isoformat(), position, game_id, away, home, game_time, full_df.attrs.get('title'))
+                for position, (away, home, game_time, game_id) in
+                enumerate(zip(full_df.index, full_df['Home'], full_df['Time'], game_ids))]
+        with self.lock, self.connection:
+            self.connection.execute('DELETE FROM schedule WHERE date = ?', (day.isoformat(),))
+            self.connection.executemany('INSERT INTO schedule VALUES (?, ?, ?, ?, ?, ?, ?)', rows)
+
+    def load_schedule_blocks(self):
+        '''Returns the date title -> (block hash, list of (away, home, time) games) saved by save_schedule_blocks'''
+        with self.lock:
+            rows = self.connection.execute('SELECT title, block_hash, games FROM schedule_blocks').fetchall()
+        return {title: (block_hash, [tuple(game) for game in json.loads(games)]) for title, block_hash, games in rows}
+
+    def save_schedule_blocks(self, blocks, removed=()):
+        '''Upserts date title -> (block hash, games) for the dates of the schedule page, deleting the removed titles'''
+        saved_at = time.time()
+        rows = [(title, block_hash, json.dumps(games), saved_at) for title, (block_hash, games) in blocks.items()]
+        with self.lock, self.connection:
+            self.connection.executemany('INSERT INTO schedule_blocks VALUES (?, ?, ?, ?) ON CONFLICT (title) '
+                                        'DO UPDATE SET block_hash = excluded.block_hash, games = excluded.games, '
+                                        'saved_at = excluded.saved_at', rows)
+            self.connection.executemany('DELETE FROM schedule_blocks WHERE title = ?', [(title,) for title in removed])
+
+    def load_scores(self, day):
+        '''Rebuilds the scores DataFrame of a datetime.date exactly as get_scores returns it, or None if it isn't complete'''
+        with self.lock:
+            date_row = self.connection.execute('SELECT page_date FROM scores_dates WHERE date = ? AND complete = 1',
+                                               (day.isoformat(),)).fetchone()
+            if date_row is None:
+                return None
+            rows = self.connection.execute(
+                'SELECT games.game_id, games.start_time, away.team, away.cells, away.runs, away.hits, away.errors, '
+                'home.team, home.cells, home.runs, home.hits, home.errors FROM games '
+                'JOIN linescores AS away ON away.game_id = games.game_id AND away.home = 0 '
+                'JOIN linescores AS home ON home.game_id = games.game_id AND home.home = 1 '
+                'WHERE games.date = ? ORDER BY games.position', (day.isoformat(),)).fetchall()
+        if not rows:
+            all_games_df = pd.DataFrame()
+        else:
+            accumulator = LinescoreAccumulator(capacity=2 * len(rows))
+            for row in rows:
+                # The stored inning cells are followed by R, H and E, the same as they're read off the box score
+                away_cells = json.loads(row[3]) + list(row[4:7])
+                home_cells = json.loads(row[8]) + list(row[9:12])
+                accumulator.add_game(row[0], row[2], away_cells, row[7], home_cells, row[1])
+            all_games_df = accumulator.to_frame()
+            all_games_df['Date'] = day.strftime('%-m.%-d.%y')
+            all_games_df = all_games_df.sort_values(by=['Local Start Time'], kind='mergesort')
+        all_games_df.attrs['page_date'] = date_row[0]
+        all_games_df.attrs['all_final'] = True
+        return all_games_df
+
+    def find_games(self, team=None, start=None, end=None, min_first5_runs=None):
+        '''Returns a DataFrame of stored team linescores, filtered by team, a datetime.date range and first five runs'''
+        conditions = []
+        parameters = []
+        if team is not None:
+            conditions.append('linescores.team = ?')
+            parameters.append(team)
+        if start is not None:
+            conditions.append('games.date >= ?')
+            parameters.append(start.isoformat())
+        if end is not None:
+            conditions.append('games.date <= ?')
+            parameters.append(end.isoformat())
+        if min_first5_runs is not None:
+            conditions.append('linescores.first5_runs >= ?')
+            parameters.append(min_first5_runs)
+        query = ('SELECT games.date AS "Date", games.game_id AS "Game ID", linescores.team AS "Team", '
+                 'CASE linescores.home WHEN 1 THEN games.away ELSE games.home END AS "Opponent", '
+                 'linescores.home AS "Home", linescores.first5_runs AS "1st5 R", linescores.runs AS "R", '
+                 'linescores.hits AS "H", linescores.errors AS "E" '
+                 'FROM linescores JOIN games ON games.game_id = linescores.game_id')
+        if conditions:
+            query += ' WHERE ' + ' AND '.join(conditions)
+        query += ' ORDER BY games.date, games.position, linescores.home'
+        with self.lock:
+            return pd.read_sql_query(query, self.connection, params=parameters)
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+
+# Shared store used by the webscraper, opened the first time it's needed
+game_store = None
+game_store_lock = threading.Lock()
+
+
+def get_game_store():
+    '''Returns the shared GameStore, creating it on first use'''
+    global game_store
+    with game_store_lock:
+        if game_store is None:
+            game_store = GameStore()
+    return game_store
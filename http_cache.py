@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+On-disk cache for the pages the webscraper downloads from BBRef and ESPN.
+
+Every page is stored in a SQLite file keyed by its url, along with when it was fetched and the ETag/Last-Modified
+headers the site sent back. How long a page is trusted depends on what kind of page it is and when it was fetched:
+    - Box score pages, the scores index (/boxes/?year=...) and ESPN scoreboards of a date never expire once they were
+      fetched after the day after that date, when the games are final and late postponements are in.
+    - The current season's schedule (MLB-schedule.shtml, or majors/<year>-schedule.shtml for this year) is trusted
+      for SCHEDULE_TTL seconds. Past seasons' schedule pages fetched after their year was over never expire.
+    - Everything else (scores index, live box scores and ESPN scoreboards of today/yesterday, or pages of earlier
+      dates fetched before they were final) is revalidated with the site on every request using
+      If-None-Match/If-Modified-Since, so an unchanged page costs a 304 instead of a download.
+Pages the site redirected to a different url aren't stored.
+
+On top of the cache, threads that ask for the same url at the same time share one request instead of each going to
+the cache (and the site). Inside a fetch_run() block (one command, one backfill...), each url is only requested once
+and each page is only parsed once (cached_parse) however many times it's asked for, even the pages that are
+revalidated on every request. The run keeps its last MEMO_PAGES pages and parsed pages in memory.
+"""
+
+import datetime
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+from http_session import fetch as session_fetch
+from metrics import record_fetch, registry
+
+# Where the cache file lives. Can be overridden with the BBREF_CACHE_PATH environment variable.
+CACHE_PATH = os.environ.get('BBREF_CACHE_PATH', os.path.join(os.path.expanduser('~'), '.bbref_cache.sqlite3'))
+# Number of seconds the season schedule page is trusted before it's downloaded again
+SCHEDULE_TTL = 10 * 60
+# TTL values used by the url classes below. NEVER_EXPIRES means the page is always served from the cache once it's
+# stored and REVALIDATE means the site is always asked if the page has changed.
+NEVER_EXPIRES = None
+REVALIDATE = 0
+
+# Patterns used to work out the date (if any) a url is for
+BOX_SCORE_DATE = re.compile(r'/boxes/[A-Z]{3}/[A-Z]{3}(\d{4})(\d{2})(\d{2})\d\.shtml')
+BOXES_INDEX_DATE = re.compile(r'/boxes/\?year=(\d+)&month=(\d+)&day=(\d+)')
+ESPN_SCOREBOARD_DATE = re.compile(r'espn\.com/mlb/scoreboard/_/date/(\d{4})(\d{2})(\d{2})')
+SEASON_SCHEDULE_YEAR = re.compile(r'/leagues/majors/(\d{4})-schedule\.shtml')
+# Number of finished pages and parsed pages a fetch_run keeps in memory
+MEMO_PAGES = 64
+
+
+def url_date(pattern, url):
+    '''Returns the date a url is for using the given pattern, or None if the url doesn't match'''
+    match = pattern.search(url)
+    if match is None:
+        return None
+    year, month, day = (int(group) for group in match.groups())
+    return datetime.date(year, month, day)
+
+
+def final_after(day):
+    '''Returns the time (as time.time()) after which the pages for a datetime.date are done changing'''
+    # Late games and postponements can still change a date's pages through the day after it, so a page is only
+    # final if it was fetched once that's over too
+    return time.mktime((day + datetime.timedelta(days=2)).timetuple())
+
+
+def url_ttl(url, fetched_at=None):
+    '''Returns the number of seconds a copy of the url fetched at fetched_at can be used before asking the site again'''
+    # Pages for a past date (or season) only never expire if the copy was fetched after they were final. A copy
+    # fetched earlier (a box score of a game in progress, a scores index BBRef filled in with an earlier date) is
+    # checked with the site like today's pages, and becomes final once it's checked after that point.
+    for pattern in (BOX_SCORE_DATE, BOXES_INDEX_DATE, ESPN_SCOREBOARD_DATE):
+        page_date = url_date(pattern, url)
+        if page_date is not None:
+            if fetched_at is not None and fetched_at >= final_after(page_date):
+                return NEVER_EXPIRES
+            return REVALIDATE
+    # A past season's schedule is done changing once the year is over
+    season = SEASON_SCHEDULE_YEAR.search(url)
+    if season is not None:
+        next_year = datetime.date(int(season.group(1)) + 1, 1, 1)
+        if fetched_at is not None and fetched_at >= time.mktime(next_year.timetuple()):
+            return NEVER_EXPIRES
+    if 'schedule.shtml' in url:
+        return SCHEDULE_TTL
+    # Anything else is always checked with the site
+    return REVALIDATE
+
+
+class CachedResponse:
+    '''Minimal stand-in for a requests.Response that is returned for pages served out of the cache'''
+
+    def __init__(self, url, status_code, content, encoding, from_cache):
+        self.url = url
+        self.status_code = status_code
+        self.content = content
+        self.encoding = encoding or 'utf-8'
+        self.from_cache = from_cache
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding, errors='replace')
+
+
+class ResponseCache:
+    '''SQLite-backed store of downloaded pages with hit/miss statistics'''
+
+    def __init__(self, path=CACHE_PATH):
+        self.path = path
+        self.lock = threading.Lock()
+        # The connection is shared by the box score worker threads so every use of it goes through self.lock
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute('CREATE TABLE IF NOT EXISTS responses (url TEXT PRIMARY KEY, status_code INTEGER, '
+                                'content BLOB, encoding TEXT, etag TEXT, last_modified TEXT, fetched_at REAL)')
+        self.connection.commit()
+        self.stats = {'hits': 0, 'misses': 0, 'revalidated': 0}
+
+    def lookup(self, url):
+        '''Returns the stored row for a url as a dictionary, or None if the url has never been stored'''
+        with self.lock:
+            row = self.connection.execute('SELECT status_code, content, encoding, etag, last_modified, fetched_at '
+                                          'FROM responses WHERE url = ?', (url,)).fetchone()
+        if row is None:
+            return None
+        return dict(zip(('status_code', 'content', 'encoding', 'etag', 'last_modified', 'fetched_at'), row))
+
+    def store(self, url, response):
+        '''Saves a successful response, replacing any older copy of the same url'''
+        with self.lock:
+            self.connection.execute('INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)',
+                                    (url, response.status_code, response.content, response.encoding,
+                                     response.headers.get('ETag'), response.headers.get('Last-Modified'),
+                                     time.time()))
+            self.connection.commit()
+
+    def touch(self, url):
+        '''Marks a stored copy as freshly checked after the site answered 304 Not Modified'''
+        with self.lock:
+            self.connection.execute('UPDATE responses SET fetched_at = ? WHERE url = ?', (time.time(), url))
+            self.connection.commit()
+
+    def count(self, key):
+        with self.lock:
+            self.stats[key] += 1
+
+    def get(self, url, fetch=None):
+        '''Returns the page for a url, only going to the site when the cached copy is missing or stale'''
+        # fetch is the function that actually does the download. It's passed the url and a dictionary of headers
+        # and has to return a requests.Response. Defaults to the shared pooled session.
+        if fetch is None:
+            fetch = session_fetch
+        # Every request is timed and counted in metrics.py by how it was answered
+        start = time.perf_counter()
+        host = urlparse(url).netloc
+        cached = self.lookup(url)
+        headers = {}
+        if cached is not None:
+            ttl = url_ttl(url, cached['fetched_at'])
+            age = time.time() - cached['fetched_at']
+            # Serves straight from the cache if the copy is still trusted
+            if ttl is NEVER_EXPIRES or age < ttl:
+                self.count('hits')
+                record_fetch(host, 'hit', time.perf_counter() - start)
+                return CachedResponse(url, cached['status_code'], cached['content'], cached['encoding'], True)
+            # Otherwise asks the site if the page has changed since the copy was stored
+            if cached['etag']:
+                headers['If-None-Match'] = cached['etag']
+            if cached['last_modified']:
+                headers['If-Modified-Since'] = cached['last_modified']
+        response = fetch(url, headers)
+        if response.status_code == 304 and cached is not None:
+            self.count('revalidated')
+            self.touch(url)
+            record_fetch(host, 'revalidated', time.perf_counter() - start)
+            return CachedResponse(url, cached['status_code'], cached['content'], cached['encoding'], True)
+        self.count('misses')
+        # Only successful pages are kept so an error page is never served back later. Neither are pages the site
+        # redirected to another url, since they aren't the page for the url that was asked for.
+        if response.status_code == 200 and response.url == url:
+            self.store(url, response)
+        record_fetch(host, 'miss', time.perf_counter() - start, len(response.content))
+        return response
+
+    def clear(self):
+        '''Removes every stored page'''
+        with self.lock:
+            self.connection.execute('DELETE FROM responses')
+            self.connection.commit()
+
+
+# Shared cache used by the webscraper, opened the first time it's needed
+response_cache = None
+response_cache_lock = threading.Lock()
+
+
+def get_response_cache():
+    '''Returns the shared ResponseCache, creating it on first use'''
+    global response_cache
+    with response_cache_lock:
+        if response_cache is None:
+            response_cache = ResponseCache()
+    return response_cache
+
+
+class PageMemo:
+    '''Runs each call for a key once at a time, sharing it with callers that ask while it's running'''
+
+    def __init__(self, max_pages=0):
+        # max_pages is the number of finished results kept and handed straight back. With 0, results are only
+        # shared while they're running.
+        self.max_pages = max_pages
+        # key -> Future of the call, least recently used first
+        self.calls = OrderedDict()
+        self.lock = threading.Lock()
+
+    def once(self, key, function, keep=None):
+        '''Returns function(), or the result of the same key's call that's running or was kept'''
+        # keep(result) says whether a finished result can be kept. Exceptions are never kept, so trying again
+        # (e.g. a retry after a failed download) calls function again.
+        with self.lock:
+            future = self.calls.get(key)
+            if future is None:
+                future = self.calls[key] = Future()
+                outcome = None
+            else:
+                self.calls.move_to_end(key)
+                outcome = 'reused' if future.done() else 'shared'
+        if outcome is not None:
+            registry.increment('bbref_page_memo_total', outcome=outcome)
+            return future.result()
+        try:
+            result = function()
+        except BaseException as error:
+            with self.lock:
+                self.calls.pop(key, None)
+            future.set_exception(error)
+            raise
+        with self.lock:
+            if self.max_pages and (keep is None or keep(result)):
+                # Forgets the least recently used results once there are too many. Calls still running are left.
+                finished = [old_key for old_key, old_future in self.calls.items() if old_future.done()]
+                for old_key in finished[:max(0, len(finished) + 1 - self.max_pages)]:
+                    del self.calls[old_key]
+            else:
+                self.calls.pop(key, None)
+        future.set_result(result)
+        return result
+
+
+# Calls in flight outside of a fetch_run, and the memo of the fetch_run that's going on (if any)
+in_flight = PageMemo()
+run_memo = None
+run_depth = 0
+run_lock = threading.Lock()
+
+
+@contextmanager
+def fetch_run(max_pages=MEMO_PAGES):
+    '''Within the with block (on any thread), each url is requested and each page parsed at most once'''
+    # Runs can be nested, in which case the inner one is part of the outer one. Anything that needs a page to be
+    # checked again while it runs (like live_scores polling) shouldn't be run inside one.
+    global run_memo, run_depth
+    with run_lock:
+        if run_memo is None:
+            run_memo = PageMemo(max_pages)
+        run_depth += 1
+        memo = run_memo
+    try:
+        yield memo
+    finally:
+        with run_lock:
+            run_depth -= 1
+            if run_depth == 0:
+                run_memo = None
+
+
+def cached_get(url, fetch=None):
+    '''Drop-in replacement for requests.get(url) that goes through the shared response cache'''
+    # Only successful pages are kept for the rest of a run, the same as the cache only stores those
+    memo = run_memo or in_flight
+    return memo.once(url, lambda: get_response_cache().get(url, fetch),
+                     keep=lambda response: response.status_code == 200)
+
+
+def cached_parse(url, name, parse):
+    '''Returns parse(response) for the page at a url, only parsing it once in a fetch_run'''
+    # name tells apart different things parsed out of the same page. Whatever parse returns is shared by everyone
+    # who asks for it, so it shouldn't be changed.
+    memo = run_memo
+    if memo is None:
+        return parse(cached_get(url))
+    return memo.once((name, url), lambda: parse(cached_get(url)))
+
+
+def cache_stats():
+    '''Returns the number of cache hits, misses, and 304 revalidations so far in this run'''
+    return dict(get_response_cache().stats)
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Shared fetch layer used for every page the webscraper downloads.
+
+All requests go through one pooled requests.Session so connections to BBRef and ESPN are kept alive and reused
+instead of doing a new TCP+TLS handshake for every page. On top of the session this adds:
+    - connect/read timeouts so a stuck request can't hang the scraper
+    - retries with exponential backoff and jitter on connection errors, 429s and 5xx responses (honoring Retry-After)
+    - a token-bucket rate limiter and a concurrency cap per site
+    - gzip (and brotli, if the brotli package is installed) compression
+
+Nothing in here is specific to BBRef or ESPN, so an HttpFetcher can be pointed at a local stub server for testing.
+"""
+
+import random
+import threading
+import time
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Default settings for the shared fetcher
+CONNECT_TIMEOUT = 5
+READ_TIMEOUT = 30
+MAX_RETRIES = 4
+BACKOFF_BASE = 1.0
+BACKOFF_CAP = 30.0
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Each site gets a bucket of REQUESTS_PER_SECOND tokens per second that can hold up to BURST tokens, and no more
+# than PER_HOST_LIMIT requests can be in flight to the same site at once
+REQUESTS_PER_SECOND = 4.0
+BURST = 4
+PER_HOST_LIMIT = 4
+POOL_SIZE = 16
+USER_AGENT = 'Baseball-Reference-Webscraper'
+
+# Only advertises brotli if urllib3 will be able to decode it
+try:
+    import brotli  # noqa: F401
+    ACCEPT_ENCODING = 'gzip, deflate, br'
+except ImportError:
+    try:
+        import brotlicffi  # noqa: F401
+        ACCEPT_ENCODING = 'gzip, deflate, br'
+    except ImportError:
+        ACCEPT_ENCODING = 'gzip, deflate'
+
+
+class TokenBucket:
+    '''Thread-safe token bucket that makes callers wait until a token is available'''
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        '''Takes one token, sleeping until the bucket has refilled enough if it's empty'''
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                # Refills the bucket for the time that has passed since it was last checked
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class HttpFetcher:
+    '''Pooled, rate-limited, retrying HTTP client'''
+
+    def __init__(self, connect_timeout=CONNECT_TIMEOUT, read_timeout=READ_TIMEOUT, max_retries=MAX_RETRIES,
+                 backoff_base=BACKOFF_BASE, backoff_cap=BACKOFF_CAP, requests_per_second=REQUESTS_PER_SECOND,
+                 burst=BURST, per_host_limit=PER_HOST_LIMIT, pool_size=POOL_SIZE):
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.requests_per_second = requests_per_second
+        self.burst = burst
+        self.per_host_limit = per_host_limit
+        # One session is shared by every request so connections are reused. Retries are handled below rather
+        # than by urllib3 so the rate limiter is applied to each retry as well.
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers.update({'User-Agent': USER_AGENT, 'Accept-Encoding': ACCEPT_ENCODING})
+        # Per-site rate limiters and concurrency caps, created the first time each site is requested
+        self.buckets = {}
+        self.semaphores = {}
+        self.lock = threading.Lock()
+
+    def host_limits(self, url):
+        '''Returns the token bucket and semaphore for the site a url is on'''
+        host = urlparse(url).netloc
+        with self.lock:
+            if host not in self.buckets:
+                self.buckets[host] = TokenBucket(self.requests_per_second, self.burst)
+                self.semaphores[host] = threading.Semaphore(self.per_host_limit)
+            return self.buckets[host], self.semaphores[host]
+
+    def backoff(self, attempt, response=None):
+        '''Returns how long to wait before the next attempt: full-jitter exponential backoff, or Retry-After'''
+        delay = random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+        if response is not None:
+            retry_after = response.headers.get('Retry-After', '')
+            if retry_after.isdigit():
+                delay = max(delay, min(self.backoff_cap, int(retry_after)))
+        return delay
+
+    def get(self, url, headers=None):
+        '''Gets a url, retrying on connection errors and retryable status codes'''
+        bucket, semaphore = self.host_limits(url)
+        for attempt in range(self.max_retries + 1):
+            bucket.acquire()
+            try:
+                with semaphore:
+                    response = self.session.get(url, headers=headers, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.max_retries:
+                    raise
+                time.sleep(self.backoff(attempt))
+                continue
+            if response.status_code not in RETRY_STATUSES or attempt == self.max_retries:
+                return response
+            time.sleep(self.backoff(attempt, response))
+        return response
+
+    def close(self):
+        self.session.close()
+
+
+# Shared fetcher used by the webscraper, created the first time it's needed
+default_fetcher = None
+default_fetcher_lock = threading.Lock()
+
+
+def get_fetcher():
+    '''Returns the shared HttpFetcher, creating it on first use'''
+    global default_fetcher
+    with default_fetcher_lock:
+        if default_fetcher is None:
+            default_fetcher = HttpFetcher()
+    return default_fetcher
+
+
+def fetch(url, headers=None):
+    '''Gets a url through the shared HttpFetcher'''
+    return get_fetcher().get(url, headers)
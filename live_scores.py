@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Live scores watch mode.
+
+Instead of downloading every box score each time the scores are checked, ScoresWatcher polls the BBRef scores page
+for a date and keeps the last linescore of every game in memory. On each poll it compares each game's summary on the
+scores page (the teams, their runs and the game's status link) with the one from the previous poll, and only
+downloads the box scores of games whose summary changed. Games that are final are pinned in memory and never
+downloaded again, so the cost of a poll is the scores page plus the box scores of the games that moved.
+
+Games that haven't started only link to their preview, so they're kept under their game ID from that link (or their
+teams, if there's no link at all) until they get a box score. Watching stops once every game is final or postponed.
+Once the date is over it also stops when the only games left never started, and by the end of the day after, it stops
+whatever is left (e.g. a suspended game), since none of it will go final on that date's page.
+
+Each poll returns a list of updates:
+    {'event': 'inning', 'game_id', 'team', 'inning', 'runs'}  - a half inning that wasn't in the last poll
+    {'event': 'final', 'game_id', 'away', 'away_runs', 'home', 'home_runs'}  - a game that just went final
+"""
+
+import datetime
+import re
+import time
+
+from bs4 import BeautifulSoup
+
+from bbref_scraper import (abbr_dict, box_score_fetcher, box_score_link, boxes_index_url, parse, scores_page_date,
+                           summary_game_id, MAX_FETCH_WORKERS, NOT_PLAYED)
+from box_scores import parse_box_score, start_time_number, LinescoreAccumulator
+from http_cache import cached_get
+
+# Number of seconds between polls of the scores page
+POLL_INTERVAL = 60
+
+
+def game_status(game):
+    '''Returns the text of a game's summary on the scores page (teams, runs and status) and whether it's final'''
+    # The status is the text of the link to the box score (e.g. Final), which is how BBRef marks finished games
+    summary = ' '.join(game.stripped_strings)
+    status_links = [str(link.string) for link in game.find_all('a') if 'boxes' in link.get('href', '')]
+    is_final = bool(status_links) and status_links[-1].startswith('Final')
+    return summary, is_final
+
+
+def unlinked_game_key(game):
+    '''Returns the key a game with no box score yet is kept under: its game ID from its preview link, or its teams'''
+    # The key can't be the game's summary text, since that changes (start time, probable pitchers) before it starts
+    game_id = summary_game_id(game)
+    if game_id is not None:
+        return game_id
+    teams = [link['href'].split('/')[2] for link in game.find_all('a', href=re.compile('/teams/'))]
+    return '@'.join(teams)
+
+
+def inning_updates(game_id, team, old_cells, new_cells):
+    '''Returns an 'inning' update for each half inning in new_cells that isn't the same in old_cells'''
+    # Both lists of cells end with R, H and E, which aren't innings
+    old_innings = old_cells[:-3]
+    updates = []
+    for inning, runs in enumerate(new_cells[:-3]):
+        if inning < len(old_innings) and old_innings[inning] == runs:
+            continue
+        updates.append({'event': 'inning', 'game_id': game_id, 'team': team, 'inning': inning + 1, 'runs': runs})
+    return updates
+
+
+class ScoresWatcher:
+    '''Polls the BBRef scores page for a date and keeps every game's linescore up to date'''
+
+    def __init__(self, day, max_workers=MAX_FETCH_WORKERS):
+        self.day = day
+        self.max_workers = max_workers
+        # game ID -> the game's summary text from the last poll its box score was downloaded on
+        self.summaries = {}
+        # game ID -> (away team, away cells, home team, home cells, start time number)
+        self.linescores = {}
+        # Game IDs of the games that are final. Their linescores are never downloaded again.
+        self.finals = set()
+        # Game IDs in the order they're listed on the scores page at the last poll
+        self.order = []
+        # Game IDs (or unlinked_game_key keys) of the games on the scores page that haven't started yet (no box score),
+        # and the ones of those that BBRef lists as postponed or cancelled
+        self.not_started = set()
+        self.not_played = set()
+        self.page_date = None
+        self.polls = 0
+        self.box_scores_fetched = 0
+
+    def poll(self):
+        '''Checks the scores page once, downloads the box scores of the games that changed and returns the updates'''
+        response = cached_get(boxes_index_url(self.day))
+        soup = BeautifulSoup(response.text, features="html.parser")
+        date = parse(soup.find_all('span', {'class': 'button2 current'}))
+        self.page_date = date[0] if date else None
+        changed = []
+        # The games are taken from the page as it is now, so a game taken off the page isn't waited for
+        self.order = []
+        self.not_started = set()
+        self.not_played = set()
+        for game in soup.find_all('div', {'class': 'game_summary nohover'}):
+            box_score = box_score_link(game)
+            if box_score is None:
+                # Games that haven't started yet only link to their preview. They're kept in the order (so watching
+                # carries on until they're final too) but there's no box score to download yet.
+                game_id = unlinked_game_key(game)
+                # The second game of a doubleheader with no links has the same teams as the first
+                while game_id in self.not_started:
+                    game_id += '+'
+                self.order.append(game_id)
+                self.not_started.add(game_id)
+                if NOT_PLAYED.search(' '.join(game.stripped_strings)):
+                    self.not_played.add(game_id)
+                continue
+            game_id, full_link = box_score
+            if game_id not in self.order:
+                self.order.append(game_id)
+            # Finished games are kept from the poll they went final on
+            if game_id in self.finals:
+                continue
+            summary, is_final = game_status(game)
+            if self.summaries.get(game_id) == summary:
+                continue
+            changed.append((game_id, full_link, summary, is_final))
+        # Only the box scores of the games that changed are downloaded (concurrently, in the order they're listed)
+        game_responses = box_score_fetcher([full_link for _, full_link, _, _ in changed], self.max_workers)
+        self.box_scores_fetched += len(game_responses)
+        updates = []
+        for (game_id, _, summary, is_final), game_response in zip(changed, game_responses):
+            away_team, away_cells, home_team, home_cells, start_time = parse_box_score(game_response.text)
+            away_team = abbr_dict.get(away_team)
+            home_team = abbr_dict.get(home_team)
+            first_sighting = game_id not in self.linescores
+            # Games that are already final the first time they're seen are reported as finals, not inning by inning
+            if not (first_sighting and is_final):
+                old = self.linescores.get(game_id, (away_team, [], home_team, [], None))
+                updates += inning_updates(game_id, away_team, old[1], away_cells)
+                updates += inning_updates(game_id, home_team, old[3], home_cells)
+            if is_final:
+                self.finals.add(game_id)
+                updates.append({'event': 'final', 'game_id': game_id, 'away': away_team, 'away_runs': away_cells[-3],
+                                'home': home_team, 'home_runs': home_cells[-3]})
+            self.summaries[game_id] = summary
+            self.linescores[game_id] = (away_team, away_cells, home_team, home_cells, start_time_number(start_time))
+        self.polls += 1
+        return updates
+
+    def frame(self):
+        '''Returns the scores DataFrame of the games seen so far, in the same format as bbref_scraper.get_scores'''
+        accumulator = LinescoreAccumulator(capacity=2 * max(len(self.linescores), 1))
+        for game_id in self.order:
+            if game_id in self.linescores:
+                accumulator.add_game(game_id, *self.linescores[game_id])
+        if len(accumulator) == 0:
+            return None
+        all_games_df = accumulator.to_frame()
+        all_games_df['Date'] = scores_page_date(self.page_date).strftime('%-m.%-d.%y')
+        all_games_df = all_games_df.sort_values(by=['Local Start Time'], kind='mergesort')
+        all_games_df.attrs['page_date'] = self.page_date
+        return all_games_df
+
+    def all_final(self):
+        '''Returns True once every game on the scores page is final, postponed or cancelled'''
+        return bool(self.order) and all(game_id in self.finals or game_id in self.not_played for game_id in self.order)
+
+    def done(self, today=None):
+        '''Returns True once none of the games left on the scores page are going to go final'''
+        # Once the date is over, games that never started won't, and by the end of the day after it anything still
+        # going (a suspended game) is finished on another date's page
+        today = today or datetime.date.today()
+        if self.all_final() or today > self.day + datetime.timedelta(days=1):
+            return True
+        return today > self.day and all(game_id in self.finals or game_id in self.not_started
+                                        for game_id in self.order)
+
+
+def watch(day, on_updates, interval=POLL_INTERVAL, max_polls=None, max_workers=MAX_FETCH_WORKERS):
+    '''Polls the scores of a datetime.date every interval seconds, passing each poll's updates and the watcher to on_updates'''
+    # Stops once every game is final or postponed (or won't go final, see ScoresWatcher.done), or after max_polls
+    # polls if it's given
+    watcher = ScoresWatcher(day, max_workers)
+    while True:
+        on_updates(watcher.poll(), watcher)
+        if watcher.done() or (max_polls is not None and watcher.polls >= max_polls):
+            return watcher
+        time.sleep(interval)
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Timing and metrics of every scrape.
+
+The scraper records how long each request to BBRef/ESPN took, how many bytes came back, whether the page came from
+the response cache, how long each page took to parse and how long the DataFrames took to put together. Recording a
+value is a lock and a few additions, so it's always on. The numbers can be read back three ways:
+    - snapshot() returns them as a dictionary
+    - prometheus_text() / write_prometheus(path) give them in the Prometheus text format (for node_exporter's
+      textfile collector, or anything else that scrapes that format)
+    - every timed stage is logged as one line of JSON to the 'bbref.metrics' logger when it's enabled at INFO level,
+      e.g. with enable_json_logs()
+
+Metrics:
+    bbref_fetch_seconds{host, outcome}      - histogram of the time a page request took (outcome is hit, miss or
+                                              revalidated)
+    bbref_fetch_bytes_total{host}           - bytes downloaded from each site
+    bbref_cache_requests_total{outcome}     - pages served from the cache (hit), revalidated with a 304, or downloaded
+    bbref_stage_seconds{stage}              - histogram of the time spent in each parse/assembly stage
+    bbref_request_seconds{request}          - histogram of the time a whole get_scores/get_schedule/... call took
+    bbref_schedule_blocks_total{outcome}    - schedule page date blocks parsed, or reused because they hadn't changed
+    bbref_server_results_total{outcome}     - server requests answered from memory (hit), by scraping (miss), or by
+                                              waiting on a scrape another request started (coalesced)
+    bbref_page_memo_total{outcome}          - page requests and parses answered by one that was already running
+                                              (shared) or already done in the same fetch_run (reused)
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# File the scraper script writes the Prometheus text to when it's done. Set with the BBREF_METRICS_PATH environment
+# variable (or --metrics on the command line).
+METRICS_PATH = os.environ.get('BBREF_METRICS_PATH')
+# Upper bounds (in seconds) of the histogram buckets
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+HELP = {
+    'bbref_fetch_seconds': 'Time taken to get a page, including cache lookups',
+    'bbref_fetch_bytes_total': 'Bytes downloaded',
+    'bbref_cache_requests_total': 'Page requests by response cache outcome',
+    'bbref_stage_seconds': 'Time spent in each parse and assembly stage',
+    'bbref_request_seconds': 'Time taken by each scraper request',
+    'bbref_schedule_blocks_total': 'Schedule page date blocks parsed or reused from an earlier version of the page',
+    'bbref_server_results_total': 'Server requests by result cache outcome',
+    'bbref_page_memo_total': 'Page requests and parses shared with an identical one that was running or done',
+}
+
+logger = logging.getLogger('bbref.metrics')
+
+
+class Histogram:
+    '''Bucketed counts, sum and count of observed values'''
+    __slots__ = ('counts', 'sum', 'count')
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for position, bound in enumerate(BUCKETS):
+            if value <= bound:
+                self.counts[position] += 1
+                break
+        self.sum += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    '''Thread-safe store of counters and histograms, keyed by metric name and labels'''
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+
+    def increment(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def reset(self):
+        with self.lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+    def snapshot(self):
+        '''Returns {metric name: [{labels, value}] for counters or [{labels, count, sum}] for histograms}'''
+        with self.lock:
+            metrics = {}
+            for (name, labels), value in sorted(self.counters.items()):
+                metrics.setdefault(name, []).append({'labels': dict(labels), 'value': value})
+            for (name, labels), histogram in sorted(self.histograms.items()):
+                metrics.setdefault(name, []).append({'labels': dict(labels), 'count': histogram.count,
+                                                     'sum': histogram.sum})
+            return metrics
+
+    def prometheus_text(self):
+        '''Returns every metric in the Prometheus text exposition format'''
+        with self.lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted((key, (list(histogram.counts), histogram.sum, histogram.count))
+                                for key, histogram in self.histograms.items())
+        lines = []
+        written_types = set()
+
+        def header(name, metric_type):
+            if name not in written_types:
+                written_types.add(name)
+                lines.append(f'# HELP {name} {HELP.get(name, name)}')
+                lines.append(f'# TYPE {name} {metric_type}')
+
+        for (name, labels), value in counters:
+            header(name, 'counter')
+            lines.append(f'{name}{label_text(labels)} {value}')
+        for (name, labels), (counts, total, count) in histograms:
+            header(name, 'histogram')
+            cumulative = 0
+            for bound, bucket_count in zip(BUCKETS, counts):
+                cumulative += bucket_count
+                lines.append(f'{name}_bucket{label_text(labels + (("le", str(bound)),))} {cumulative}')
+            lines.append(f'{name}_bucket{label_text(labels + (("le", "+Inf"),))} {count}')
+            lines.append(f'{name}_sum{label_text(labels)} {total:.6f}')
+            lines.append(f'{name}_count{label_text(labels)} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+def label_text(labels):
+    '''Formats labels the way Prometheus expects them, e.g. {host="www.espn.com",outcome="hit"}'''
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{escape_label(value)}"' for key, value in labels) + '}'
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+# The registry every part of the scraper records to
+registry = MetricsRegistry()
+
+
+def log_event(event, **fields):
+    '''Logs one line of JSON to the bbref.metrics logger, if it's enabled'''
+    # Checks the level first so nothing is formatted when the logs aren't being kept
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(json.dumps(dict({'event': event, 'ts': round(time.time(), 3)}, **fields)))
+
+
+def record_fetch(host, outcome, seconds, downloaded_bytes=0):
+    '''Records one page request: how long it took, whether the cache answered it and how many bytes came back'''
+    registry.observe('bbref_fetch_seconds', seconds, host=host, outcome=outcome)
+    registry.increment('bbref_cache_requests_total', outcome=outcome)
+    if downloaded_bytes:
+        registry.increment('bbref_fetch_bytes_total', downloaded_bytes, host=host)
+    log_event('fetch', host=host, outcome=outcome, seconds=round(seconds, 6), bytes=downloaded_bytes)
+
+
+@contextmanager
+def timed(stage, metric='bbref_stage_seconds', **fields):
+    '''Times the code inside the with block and records it as a stage (or with metric, as something else)'''
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - start, metric, **fields)
+
+
+def record_stage(stage, seconds, metric='bbref_stage_seconds', **fields):
+    '''Records a stage that was timed somewhere else (e.g. a box score parsed in a worker process)'''
+    label = 'request' if metric == 'bbref_request_seconds' else 'stage'
+    registry.observe(metric, seconds, **{label: stage})
+    log_event(label, name=stage, seconds=round(seconds, 6), **fields)
+
+
+def timed_request(request, **fields):
+    '''Times a whole scraper request (e.g. get_scores)'''
+    return timed(request, metric='bbref_request_seconds', **fields)
+
+
+def snapshot():
+    return registry.snapshot()
+
+
+def prometheus_text():
+    return registry.prometheus_text()
+
+
+def write_prometheus(path):
+    '''Writes the metrics to a Prometheus text file, replacing it in one step so readers never see half a file'''
+    with open(path + '.tmp', 'w') as metrics_file:
+        metrics_file.write(prometheus_text())
+    os.replace(path + '.tmp', path)
+
+
+def enable_json_logs(stream=None, path=None):
+    '''Sends the JSON lines of the bbref.metrics logger to a file (path) or stream (stderr by default)'''
+    handler = logging.FileHandler(path) if path else logging.StreamHandler(stream)
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    return handler
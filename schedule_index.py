@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Index of the BBRef season schedule page.
+
+The schedule page has one <div> per date, each starting with an <h3> title like "Thursday, April 7, 2022" (or
+"Today's Games" for the current day). Instead of searching the whole page for every request, ScheduleIndex goes
+through the <h3> titles once and maps each date (without the day of the week, e.g. "April 7, 2022") to its <div>, so
+finding any date's games is a dictionary lookup. Indexes are cached per page so today's, tomorrow's and custom date
+requests (or a request for several dates at once) all share one parse.
+
+The page is split into each date's block with a quick string scan and every block is hashed on its own. Only blocks
+that haven't been seen before are built into trees, so when BBRef updates the page (final scores, a rescheduled
+game) only the dates that changed are parsed again, and changed_dates tells which dates those were.
+"""
+
+import datetime
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+
+from bs4 import BeautifulSoup
+
+from metrics import registry
+
+TODAYS_GAMES = "Today's Games"
+# Number of parsed schedule pages kept in memory
+CACHED_PAGES = 4
+# Number of parsed date blocks kept in memory, enough for a few versions of a full season's page
+CACHED_BLOCKS = 1000
+# Tags used to find where each date's block starts and ends
+H3_TAG = re.compile(r'<h3\b')
+DIV_TAG = re.compile(r'<(/?)div\b')
+
+
+def date_key(title):
+    '''Takes the day of the week off the front of a date table's title (e.g. Thursday, April 7, 2022 -> April 7, 2022)'''
+    if title == TODAYS_GAMES:
+        return title
+    key = title[(title.find(',') + 2):]
+    # Sometimes BBRef titles the table for today "Today's Games" in a slightly different format from the rest of
+    # the dates, which the line above cuts down to "oday's Games"
+    if key == "oday's Games":
+        return TODAYS_GAMES
+    return key
+
+
+def format_date(day):
+    '''Formats a datetime.date the same way BBRef titles its date tables (e.g. April 7, 2022)'''
+    return day.strftime('%B %-d, %Y')
+
+
+def date_blocks(html):
+    '''Returns the html of each date's <div> on a schedule page in order, or None if the page isn't laid out as expected'''
+    blocks = []
+    end = 0
+    for h3 in H3_TAG.finditer(html):
+        # Each date's block is the <div> the <h3> title opens, up to the </div> that balances it
+        start = html.rfind('<div', end, h3.start())
+        if start == -1:
+            return None
+        depth = 0
+        for div_tag in DIV_TAG.finditer(html, start):
+            depth += -1 if div_tag.group(1) else 1
+            if depth == 0:
+                end = html.find('>', div_tag.end()) + 1
+                break
+        else:
+            return None
+        block = html[start:end]
+        # A block with more than one title means the dates aren't in a <div> each
+        if len(H3_TAG.findall(block)) != 1:
+            return None
+        blocks.append(block)
+    return blocks
+
+
+# Parsed date blocks, keyed by a hash of the block's html
+parsed_blocks = OrderedDict()
+# Guards parsed_blocks and schedule_indexes, which threads (the async engine's parse threads, the server's request
+# threads) can get to at the same time. Held while a page is indexed so two threads never parse the same page.
+index_lock = threading.RLock()
+
+
+def block_table(block, block_hash):
+    '''Returns the parsed <div> of a date's block, only parsing it if an identical block hasn't been parsed already'''
+    with index_lock:
+        if block_hash in parsed_blocks:
+            parsed_blocks.move_to_end(block_hash)
+            registry.increment('bbref_schedule_blocks_total', outcome='reused')
+            return parsed_blocks[block_hash]
+        table = BeautifulSoup(block, features="html.parser").find('div')
+        parsed_blocks[block_hash] = table
+        registry.increment('bbref_schedule_blocks_total', outcome='parsed')
+        while len(parsed_blocks) > CACHED_BLOCKS:
+            parsed_blocks.popitem(last=False)
+        return table
+
+
+class ScheduleIndex:
+    '''Maps every date on a schedule page to the <div> holding that date's games'''
+
+    def __init__(self, html):
+        # Keeps the dates in the order they're listed on the page, along with a hash of each date's block
+        self.tables = OrderedDict()
+        self.hashes = {}
+        blocks = date_blocks(html)
+        if blocks is None:
+            # Falls back to a tree of the whole page
+            soup = BeautifulSoup(html, features="html.parser")
+            titled_tables = [(h3, h3.find_parent('div')) for h3 in soup.find_all('h3')]
+            block_hashes = [hashlib.sha1(str(table).encode('utf-8')).hexdigest() for _, table in titled_tables]
+        else:
+            block_hashes = [hashlib.sha1(block.encode('utf-8')).hexdigest() for block in blocks]
+            titled_tables = []
+            for block, block_hash in zip(blocks, block_hashes):
+                table = block_table(block, block_hash)
+                titled_tables.append((table.find('h3'), table))
+        for (h3, table), block_hash in zip(titled_tables, block_hashes):
+            key = date_key(str(h3.string))
+            # Only the first table for a date is used, the same as list.index would find
+            if key not in self.tables:
+                self.tables[key] = table
+                self.hashes[key] = block_hash
+
+    def __contains__(self, key):
+        return key in self.tables
+
+    def dates(self):
+        '''Returns all the dates on the page in the order they're listed'''
+        return list(self.tables)
+
+    def table(self, key):
+        '''Returns the <div> for a date title (e.g. April 7, 2022 or Today's Games), raising KeyError if it's not on the page'''
+        return self.tables[key]
+
+    def table_for_date(self, day, today=None):
+        '''Returns the <div> for a datetime.date, using the "Today's Games" table for today if it isn't titled by date'''
+        today = today or datetime.date.today()
+        key = format_date(day)
+        if key not in self.tables and day == today:
+            key = TODAYS_GAMES
+        return self.tables[key]
+
+    def changed_dates(self, previous):
+        '''Returns the dates whose games are different from (or aren't on) a previous ScheduleIndex, then the dates that were taken off'''
+        changed = [key for key, block_hash in self.hashes.items() if previous.hashes.get(key) != block_hash]
+        return changed + [key for key in previous.hashes if key not in self.hashes]
+
+    def tables_for_dates(self, days, today=None):
+        '''Returns a dictionary of datetime.date -> <div> for each of the dates that are on the page'''
+        tables = {}
+        for day in days:
+            try:
+                tables[day] = self.table_for_date(day, today)
+            except KeyError:
+                continue
+        return tables
+
+
+# Parsed schedule pages, keyed by a hash of the page's html
+schedule_indexes = OrderedDict()
+
+
+def schedule_index_for(html):
+    '''Returns the ScheduleIndex for a schedule page, only parsing the page if it hasn't been parsed already'''
+    page_hash = hashlib.sha1(html.encode('utf-8')).hexdigest()
+    with index_lock:
+        if page_hash in schedule_indexes:
+            schedule_indexes.move_to_end(page_hash)
+            return schedule_indexes[page_hash]
+        index = ScheduleIndex(html)
+        schedule_indexes[page_hash] = index
+        # Forgets the least recently used pages once there are too many
+        while len(schedule_indexes) > CACHED_PAGES:
+            schedule_indexes.popitem(last=False)
+        return index
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Local HTTP service that serves the schedule and scores from one scraper to everyone who needs them.
+
+Instead of every person (and the Google Sheet) scraping the same date through their own copy of the GUI, one copy
+runs `Baseball-Reference-Webscraper.py serve` and everything else asks it. Endpoints, with dates as YYYY-MM-DD,
+today, tomorrow or yesterday:
+    GET /schedule/<date>        - the schedule of a date (get_schedule)
+    GET /scores/<date>          - the scores of a date (get_scores). ?condensed=1 gives just the 1st5 R, Total R and
+                                  Date columns, the ones the GUI's scores button copies (scores_compiler)
+    GET /postponements/<date>   - the games ESPN lists as postponed from the day before (check_postponements)
+    GET /changes                - the games added to or taken off BBRef's schedule since the last check, by the server
+                                  or any other run of the scraper (get_schedule_changes)
+    GET /metrics                - the scraper's metrics in the Prometheus text format (metrics.py)
+Results are JSON records, the same as the command line's --format json, or CSV with ?format=csv. The date of the
+BBRef page a date's scores came from is sent in the X-Page-Date header, and X-Result-Cache says whether the result
+was already in memory (hit), had to be scraped (miss) or came from a scrape another request had already started
+(coalesced).
+
+Computed DataFrames are kept in memory in a ResultCache, an LRU of MAX_RESULTS results. Results for dates before
+yesterday are kept for PAST_RESULT_TTL seconds, since they won't change, and everything else for RESULT_TTL seconds.
+Identical requests that come in while a result is being scraped wait for that scrape rather than starting their own,
+so a date is only ever being scraped once at a time.
+"""
+
+import datetime
+import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pandas as pd
+
+import bbref_scraper
+from metrics import prometheus_text, registry
+
+# Address the server listens on by default. Only this computer can reach it unless the host is changed (e.g. to
+# 0.0.0.0 to serve the whole network).
+HOST = '127.0.0.1'
+PORT = 8080
+# Number of computed DataFrames kept in memory
+MAX_RESULTS = 64
+# Seconds a result is served from memory before it's scraped again: dates before yesterday, then everything else
+PAST_RESULT_TTL = 6 * 60 * 60
+RESULT_TTL = 60
+# Columns of the condensed scores, the ones scores_compiler copies to the clipboard
+CONDENSED_COLUMNS = ['1st5 R', 'Total R', 'Date']
+
+
+class ResultCache:
+    '''In-memory LRU of computed DataFrames with expiry times, computing each missing one once however many ask for it'''
+
+    def __init__(self, max_results=MAX_RESULTS):
+        self.max_results = max_results
+        # key -> (monotonic time the result expires, DataFrame), least recently used first
+        self.results = OrderedDict()
+        # key -> Future of a result that's being computed
+        self.in_flight = {}
+        self.lock = threading.Lock()
+
+    def get(self, key, compute, ttl):
+        '''Returns the result for key and whether it was a hit, miss or coalesced, calling compute() on a miss'''
+        # An exception from compute() is raised to every request that was waiting on it, and nothing is kept
+        with self.lock:
+            entry = self.results.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self.results.move_to_end(key)
+                outcome = 'hit'
+            else:
+                future = self.in_flight.get(key)
+                outcome = 'coalesced' if future is not None else 'miss'
+                if future is None:
+                    future = self.in_flight[key] = Future()
+        registry.increment('bbref_server_results_total', outcome=outcome)
+        if outcome == 'hit':
+            return entry[1], outcome
+        if outcome == 'coalesced':
+            return future.result(), outcome
+        try:
+            result = compute()
+        except BaseException as error:
+            with self.lock:
+                del self.in_flight[key]
+            future.set_exception(error)
+            raise
+        with self.lock:
+            del self.in_flight[key]
+            self.results[key] = (time.monotonic() + ttl, result)
+            self.results.move_to_end(key)
+            # Forgets the least recently used results once there are too many
+            while len(self.results) > self.max_results:
+                self.results.popitem(last=False)
+        future.set_result(result)
+        return result, outcome
+
+    def clear(self):
+        with self.lock:
+            self.results.clear()
+
+
+def request_date(text, today=None):
+    '''Converts a date in a url (YYYY-MM-DD, today, tomorrow or yesterday) into a datetime.date, raising ValueError'''
+    today = today or datetime.date.today()
+    offsets = {'yesterday': -1, 'today': 0, 'tomorrow': 1}
+    if text in offsets:
+        return today + datetime.timedelta(days=offsets[text])
+    return datetime.date.fromisoformat(text)
+
+
+def result_ttl(day, today=None):
+    '''Returns the number of seconds the result for a datetime.date is kept'''
+    today = today or datetime.date.today()
+    return PAST_RESULT_TTL if day < today - datetime.timedelta(days=1) else RESULT_TTL
+
+
+def scores_frame(day):
+    '''Returns get_scores for a datetime.date, with its index named the way the command line names it'''
+    all_games_df = bbref_scraper.get_scores(day)
+    all_games_df.index.name = 'Team'
+    return all_games_df
+
+
+# Endpoint -> the function that computes its DataFrame for a datetime.date
+ENDPOINTS = {
+    'schedule': bbref_scraper.get_schedule,
+    'scores': scores_frame,
+    'postponements': bbref_scraper.check_postponements,
+}
+
+
+def frame_body(frame, output_format):
+    '''Returns a DataFrame as the text of a JSON or CSV response and its content type'''
+    # Frames indexed by team keep their index as the first column, plain numbered frames leave it out
+    keep_index = not isinstance(frame.index, pd.RangeIndex)
+    if output_format == 'csv':
+        return frame.to_csv(index=keep_index), 'text/csv; charset=utf-8'
+    return (frame.reset_index() if keep_index else frame).to_json(orient='records'), 'application/json'
+
+
+class ScraperRequestHandler(BaseHTTPRequestHandler):
+    '''Answers the server's GET requests'''
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        parts = [part for part in url.path.split('/') if part]
+        if parts == ['metrics']:
+            self.send_body(200, prometheus_text(), 'text/plain; version=0.0.4')
+            return
+        if parts != ['changes'] and (len(parts) != 2 or parts[0] not in ENDPOINTS):
+            self.send_error_body(404, 'Not found. Use /schedule/<date>, /scores/<date>, /postponements/<date>, '
+                                      '/changes or /metrics')
+            return
+        output_format = query.get('format', ['json'])[0]
+        if output_format not in ('json', 'csv'):
+            self.send_error_body(400, 'format should be json or csv')
+            return
+        if parts == ['changes']:
+            # Every check moves the last check forward, so the changes are kept for RESULT_TTL seconds and everyone
+            # asking in that time gets the same ones
+            try:
+                frame, outcome = self.server.result_cache.get(('changes',), bbref_scraper.get_schedule_changes,
+                                                              RESULT_TTL)
+            except Exception as error:
+                self.send_error_body(502, 'Scraping failed: ' + str(error))
+                return
+            body, content_type = frame_body(frame, output_format)
+            self.send_body(200, body, content_type, {'X-Result-Cache': outcome})
+            return
+        try:
+            day = request_date(parts[1])
+        except ValueError:
+            self.send_error_body(400, 'dates should be YYYY-MM-DD, today, tomorrow or yesterday')
+            return
+        compute = ENDPOINTS[parts[0]]
+        try:
+            frame, outcome = self.server.result_cache.get((parts[0], day), lambda: compute(day), result_ttl(day))
+        except ValueError as error:
+            # get_schedule raises ValueError for dates that aren't on the schedule
+            self.send_error_body(404, str(error))
+            return
+        except Exception as error:
+            self.send_error_body(502, 'Scraping failed: ' + str(error))
+            return
+        headers = {'X-Result-Cache': outcome}
+        if parts[0] == 'scores':
+            if frame.attrs.get('page_date'):
+                headers['X-Page-Date'] = frame.attrs['page_date']
+            if query.get('condensed', ['0'])[0] not in ('0', '') and not frame.empty:
+                frame = frame[CONDENSED_COLUMNS]
+        body, content_type = frame_body(frame, output_format)
+        self.send_body(200, body, content_type, headers)
+
+    def send_body(self, status, body, content_type, headers=None):
+        data = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def send_error_body(self, status, message):
+        self.send_body(status, json.dumps({'error': message}), 'application/json')
+
+
+def make_server(host=HOST, port=PORT, result_cache=None):
+    '''Returns a threaded HTTP server for the endpoints, which answers each request on its own thread'''
+    server = ThreadingHTTPServer((host, port), ScraperRequestHandler)
+    server.daemon_threads = True
+    server.result_cache = result_cache or ResultCache()
+    return server
+
+
+def serve(host=HOST, port=PORT):
+    '''Runs the server until it's interrupted (Ctrl+C)'''
+    server = make_server(host, port)
+    print(f'Serving the schedule and scores on http://{host}:{server.server_port}/')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Columnar storage of scraped schedules and linescores.
+
+The schedule DataFrames from get_schedule and the scores DataFrames from get_scores are written as Parquet (or Arrow
+IPC) files partitioned by season and date, so history only has to be scraped once:
+    <root>/linescores/season=2022/date=2022-04-08/part-<timestamp>.parquet
+    <root>/schedules/season=2022/date=2022-04-08/part-<timestamp>.parquet
+
+Every file in a dataset has the same schema (LINESCORE_SCHEMA / SCHEDULE_SCHEMA below), whatever the number of
+innings played that day. Writes only ever add new files: games already stored for a date (and schedules identical to
+the last one stored for a date) are skipped. Reads go through pyarrow.dataset with memory-mapped files, filtering on
+the season/date partitions and only loading the columns asked for, so analysis over several seasons doesn't have to
+pull everything into memory at once.
+
+pyarrow is only needed for this module. Nothing else in the scraper imports it.
+"""
+
+import datetime
+import os
+import time
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.fs
+except ImportError:
+    pa = None
+
+# Where the datasets are written. Can be overridden with the BBREF_STORAGE_DIR environment variable.
+STORAGE_DIR = os.environ.get('BBREF_STORAGE_DIR', os.path.join(os.path.expanduser('~'), 'bbref_storage'))
+# File formats that can be written, and the extension used for each
+FILE_EXTENSIONS = {'parquet': '.parquet', 'arrow': '.arrow'}
+
+if pa is not None:
+    # One row per team per game. Innings is the runs in each half inning the team batted, with half innings that
+    # weren't batted ('X' on BBRef) as nulls.
+    LINESCORE_SCHEMA = pa.schema([
+        ('game_id', pa.string()),
+        ('date', pa.date32()),
+        ('team', pa.string()),
+        ('opponent', pa.string()),
+        ('home', pa.bool_()),
+        ('innings', pa.list_(pa.int16())),
+        ('first5_runs', pa.int16()),
+        ('runs', pa.int16()),
+        ('hits', pa.int16()),
+        ('errors', pa.int16()),
+        ('local_start_time', pa.float64()),
+    ])
+    # One row per game on the schedule for a date
+    SCHEDULE_SCHEMA = pa.schema([
+        ('date', pa.date32()),
+        ('away', pa.string()),
+        ('home', pa.string()),
+        ('time', pa.string()),
+        ('title', pa.string()),
+    ])
+    # season=2022/date=2022-04-08 directories
+    PARTITIONING = ds.partitioning(pa.schema([('season', pa.int16()), ('date', pa.date32())]), flavor='hive')
+
+
+def require_pyarrow():
+    '''Raises ImportError with install instructions if pyarrow isn't installed'''
+    if pa is None:
+        raise ImportError('Saving to or reading from storage needs pyarrow (pip install pyarrow)')
+
+
+def frame_date(frame):
+    '''Returns the datetime.date in a schedule or scores DataFrame's Date column (e.g. 4.8.22)'''
+    return datetime.datetime.strptime(frame['Date'].iloc[0], '%m.%d.%y').date()
+
+
+def partition_dir(root, dataset, day):
+    '''Returns the directory the files of a dataset are written to for a datetime.date'''
+    return os.path.join(root, dataset, 'season=' + str(day.year), 'date=' + day.isoformat())
+
+
+def partition_files(directory):
+    '''Returns the paths of the files already written to a partition directory, oldest first'''
+    if not os.path.isdir(directory):
+        return []
+    return sorted(os.path.join(directory, name) for name in os.listdir(directory)
+                  if name.startswith('part-') and os.path.splitext(name)[1] in FILE_EXTENSIONS.values())
+
+
+def read_files(paths, columns=None):
+    '''Reads a list of Parquet and Arrow IPC files into one pyarrow Table'''
+    tables = []
+    for path in paths:
+        file_format = 'ipc' if path.endswith(FILE_EXTENSIONS['arrow']) else 'parquet'
+        tables.append(ds.dataset(path, format=file_format).to_table(columns=columns))
+    return pa.concat_tables(tables)
+
+
+def write_partition(table, root, dataset, day, file_format):
+    '''Writes a table as a new file in the dataset's partition for a datetime.date and returns its path'''
+    if file_format not in FILE_EXTENSIONS:
+        raise ValueError('file_format should be one of ' + ', '.join(FILE_EXTENSIONS))
+    directory = partition_dir(root, dataset, day)
+    os.makedirs(directory, exist_ok=True)
+    # Files are named by when they were written so they sort in the order they were added
+    path = os.path.join(directory, 'part-' + str(time.time_ns()) + FILE_EXTENSIONS[file_format])
+    # Writes to a temporary file first so readers never see half a file
+    if file_format == 'parquet':
+        import pyarrow.parquet as pq
+        pq.write_table(table, path + '.tmp')
+    else:
+        import pyarrow.feather as feather
+        feather.write_feather(table, path + '.tmp', compression='uncompressed')
+    os.replace(path + '.tmp', path)
+    return path
+
+
+def linescore_table(all_games_df):
+    '''Converts a scores DataFrame from get_scores into a pyarrow Table with LINESCORE_SCHEMA'''
+    day = frame_date(all_games_df)
+    inning_columns = [column for column in all_games_df.columns if column.isdigit()]
+    # The two rows of a game are always away then home
+    home = (all_games_df.groupby('Game ID', sort=False).cumcount() == 1).tolist()
+    teams = all_games_df.index.tolist()
+    opponents = [teams[row + 1] if not home[row] else teams[row - 1] for row in range(len(teams))]
+    innings = []
+    for cells in all_games_df[inning_columns].itertuples(index=False):
+        cells = [None if cell == '-' else int(cell) for cell in cells]
+        while cells and cells[-1] is None:
+            cells.pop()
+        innings.append(cells)
+    # Drops the '-' columns past the end of the game (from other games going to extra innings), but keeps the half
+    # innings the team didn't bat in (like the bottom of the 9th for a home team that was winning) as nulls
+    game_ids = all_games_df['Game ID'].tolist()
+    game_innings = {}
+    for game_id, cells in zip(game_ids, innings):
+        game_innings[game_id] = max(game_innings.get(game_id, 0), len(cells))
+    innings = [cells + [None] * (game_innings[game_id] - len(cells)) for game_id, cells in zip(game_ids, innings)]
+    columns = {
+        'game_id': game_ids,
+        'date': [day] * len(teams),
+        'team': teams,
+        'opponent': opponents,
+        'home': home,
+        'innings': innings,
+        'first5_runs': all_games_df['1st5 R'].tolist(),
+        'runs': all_games_df['R'].tolist(),
+        'hits': all_games_df['H'].tolist(),
+        'errors': all_games_df['E'].tolist(),
+        'local_start_time': all_games_df['Local Start Time'].tolist(),
+    }
+    return pa.Table.from_pydict(columns, schema=LINESCORE_SCHEMA)
+
+
+def schedule_table(full_df):
+    '''Converts a schedule DataFrame from get_schedule into a pyarrow Table with SCHEDULE_SCHEMA'''
+    day = frame_date(full_df)
+    columns = {
+        'date': [day] * len(full_df),
+        'away': full_df.index.tolist(),
+        'home': full_df['Home'].tolist(),
+        'time': full_df['Time'].tolist(),
+        'title': [full_df.attrs.get('title')] * len(full_df),
+    }
+    return pa.Table.from_pydict(columns, schema=SCHEDULE_SCHEMA)
+
+
+def save_scores(all_games_df, root=STORAGE_DIR, file_format='parquet'):
+    '''Appends the games in a scores DataFrame that aren't stored yet, returning the path written (or None)'''
+    require_pyarrow()
+    if all_games_df.empty:
+        return None
+    table = linescore_table(all_games_df)
+    day = frame_date(all_games_df)
+    # Skips the games that are already in the date's partition, so saving the same date twice adds nothing
+    existing_files = partition_files(partition_dir(root, 'linescores', day))
+    if existing_files:
+        stored_ids = set(read_files(existing_files, columns=['game_id']).column('game_id').to_pylist())
+        keep = [game_id not in stored_ids for game_id in table.column('game_id').to_pylist()]
+        table = table.filter(pa.array(keep))
+    if table.num_rows == 0:
+        return None
+    return write_partition(table, root, 'linescores', day, file_format)
+
+
+def save_schedule(full_df, root=STORAGE_DIR, file_format='parquet'):
+    '''Appends a schedule DataFrame unless it's the same as the last one stored for its date, returning the path written (or None)'''
+    require_pyarrow()
+    if full_df.empty:
+        return None
+    table = schedule_table(full_df)
+    day = frame_date(full_df)
+    # Schedules change (postponements, new start times), so a changed schedule is stored as a new file. Readers
+    # use the latest file of each date.
+    existing_files = partition_files(partition_dir(root, 'schedules', day))
+    if existing_files and read_files(existing_files[-1:]).equals(table):
+        return None
+    return write_partition(table, root, 'schedules', day, file_format)
+
+
+def open_dataset(root, dataset):
+    '''Opens a dataset (linescores or schedules) for memory-mapped, partition-filtered reads'''
+    require_pyarrow()
+    filesystem = pyarrow.fs.LocalFileSystem(use_mmap=True)
+    directory = os.path.join(root, dataset)
+    # Parquet and Arrow IPC files can both be in a dataset, so each format is opened on its own and then combined
+    parts = []
+    for file_format, extension in (('parquet', FILE_EXTENSIONS['parquet']), ('ipc', FILE_EXTENSIONS['arrow'])):
+        paths = [os.path.join(folder, name) for folder, _, names in os.walk(directory) for name in names
+                 if name.startswith('part-') and name.endswith(extension)]
+        if paths:
+            parts.append(ds.dataset(sorted(paths), format=file_format, filesystem=filesystem,
+                                    partitioning=PARTITIONING, partition_base_dir=directory))
+    if not parts:
+        raise FileNotFoundError('No ' + dataset + ' stored in ' + root)
+    return parts[0] if len(parts) == 1 else ds.dataset(parts)
+
+
+def date_filter(seasons=None, start=None, end=None):
+    '''Builds a pyarrow filter on the season/date partitions from a list of seasons and a datetime.date range'''
+    conditions = []
+    if seasons is not None:
+        conditions.append(ds.field('season').isin(list(seasons)))
+    if start is not None:
+        conditions.append(ds.field('date') >= pa.scalar(start, pa.date32()))
+    if end is not None:
+        conditions.append(ds.field('date') <= pa.scalar(end, pa.date32()))
+    condition = None
+    for expression in conditions:
+        condition = expression if condition is None else condition & expression
+    return condition
+
+
+def scan_linescores(root=STORAGE_DIR, seasons=None, start=None, end=None, columns=None):
+    '''Yields the stored linescores one pyarrow RecordBatch at a time, so they never all have to be in memory'''
+    dataset = open_dataset(root, 'linescores')
+    yield from dataset.to_batches(columns=columns, filter=date_filter(seasons, start, end))
+
+
+def read_linescores(root=STORAGE_DIR, seasons=None, start=None, end=None, columns=None):
+    '''Returns the stored linescores for some seasons and/or a date range as a pyarrow Table'''
+    dataset = open_dataset(root, 'linescores')
+    return dataset.to_table(columns=columns, filter=date_filter(seasons, start, end))
+
+
+def read_schedules(root=STORAGE_DIR, seasons=None, start=None, end=None, columns=None):
+    '''Returns the stored schedules for some seasons and/or a date range as a pyarrow Table'''
+    dataset = open_dataset(root, 'schedules')
+    return dataset.to_table(columns=columns, filter=date_filter(seasons, start, end))
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Derived team stats over scraped linescores.
+
+TeamStats takes scores DataFrames (from get_scores or the game store) a date at a time and turns each game into two
+team-game rows (one per team) with:
+    1st1 R ... 1st9 R     - runs the team scored in the first N innings
+    1st1 RA ... 1st9 RA   - runs the team allowed in the first N innings
+    R, RA, Game Total     - runs scored, runs allowed and both teams' runs
+All of them come from one cumulative sum over the innings matrix, and the runs allowed are the opponent's row of the
+same matrix, so nothing is added up column by column.
+
+From the rows it keeps:
+    splits()          - games and averages of every stat for each team, home, away and overall
+    over_rates()      - the share of each team's games that went over each total-runs line (TOTAL_LINES) and first
+                        five innings line (FIRST5_LINES). The lines all end in .5, so under is 1 - over.
+    rolling(window)   - each team's average runs scored and allowed over the last 7/14/30 days, for every date
+Adding a date only updates the running totals with the new games and only recomputes the rolling averages of the
+dates within one window of the new ones, so keeping the stats current through a season never goes back over the
+whole season.
+"""
+
+import datetime
+
+import numpy as np
+import pandas as pd
+
+# First N innings stats are kept for N = 1 to FIRST_INNINGS
+FIRST_INNINGS = 9
+# Rolling average windows, in days
+WINDOWS = (7, 14, 30)
+# Over/under lines the hit rates are worked out for
+TOTAL_LINES = (6.5, 7.5, 8.5, 9.5, 10.5)
+FIRST5_LINES = (3.5, 4.5, 5.5)
+# Stats that are summed and averaged for each team
+STATS = ([f'1st{innings} R' for innings in range(1, FIRST_INNINGS + 1)] +
+         [f'1st{innings} RA' for innings in range(1, FIRST_INNINGS + 1)] + ['R', 'RA', 'Game Total'])
+OVER_COLUMNS = ([f'Over {line}' for line in TOTAL_LINES] + [f'1st5 Over {line}' for line in FIRST5_LINES])
+
+
+def team_games(all_games_df):
+    '''Turns a scores DataFrame from get_scores into one row per team per game with the derived stats'''
+    if all_games_df.empty:
+        return pd.DataFrame(columns=['Date', 'Game ID', 'Team', 'Opponent', 'Home'] + STATS + OVER_COLUMNS)
+    inning_columns = sorted((column for column in all_games_df.columns if column.isdigit()), key=int)
+    # Half innings that weren't batted ('-') count as no runs, as do the extra innings columns of other dates' games
+    # when several dates' frames were joined (NaN). The matrix is padded out to FIRST_INNINGS innings so a game
+    # called early still has every 1st N column.
+    cells = all_games_df[inning_columns].to_numpy()
+    innings = np.where((cells == '-') | pd.isna(cells), 0, cells).astype(np.int64)
+    if innings.shape[1] < FIRST_INNINGS:
+        innings = np.pad(innings, ((0, 0), (0, FIRST_INNINGS - innings.shape[1])))
+    first_innings = innings[:, :FIRST_INNINGS].cumsum(axis=1)
+    # The two rows of a game are away then home, next to each other, so each row's opponent is the row beside it
+    home = (all_games_df.groupby('Game ID', sort=False).cumcount() == 1).to_numpy()
+    rows = np.arange(len(all_games_df))
+    opponent_rows = np.where(home, rows - 1, rows + 1)
+    runs = all_games_df['R'].to_numpy()
+    teams = all_games_df.index.to_numpy()
+    frame = pd.DataFrame({
+        'Date': pd.to_datetime(all_games_df['Date'].to_numpy(), format='%m.%d.%y'),
+        'Game ID': all_games_df['Game ID'].to_numpy(),
+        'Team': teams,
+        'Opponent': teams[opponent_rows],
+        'Home': home,
+    })
+    for innings_played in range(1, FIRST_INNINGS + 1):
+        frame[f'1st{innings_played} R'] = first_innings[:, innings_played - 1]
+    for innings_played in range(1, FIRST_INNINGS + 1):
+        frame[f'1st{innings_played} RA'] = first_innings[opponent_rows, innings_played - 1]
+    frame['R'] = runs
+    frame['RA'] = runs[opponent_rows]
+    frame['Game Total'] = frame['R'] + frame['RA']
+    first5_total = frame['1st5 R'] + frame['1st5 RA']
+    for line in TOTAL_LINES:
+        frame[f'Over {line}'] = frame['Game Total'] > line
+    for line in FIRST5_LINES:
+        frame[f'1st5 Over {line}'] = first5_total > line
+    return frame
+
+
+class TeamStats:
+    '''Running team splits, over/under hit rates and rolling averages, updated a date at a time'''
+
+    def __init__(self, windows=WINDOWS):
+        self.windows = tuple(windows)
+        # Every team-game row added so far, kept as the list of frames that were added (joined when needed)
+        self.frames = []
+        self.game_ids = set()
+        # Running sums of every stat (and games played) for each team and home/away
+        self.totals = None
+        # Sums of runs scored/allowed and games for each team and date, the only thing the rolling averages need
+        self.daily = None
+        # window -> DataFrame of Team, Date and the rolling averages
+        self.rolling_frames = {window: None for window in self.windows}
+
+    def add_scores(self, all_games_df):
+        '''Adds a date's scores DataFrame (games already added are skipped, so adding a date twice changes nothing)'''
+        new_rows = team_games(all_games_df)
+        new_rows = new_rows[~new_rows['Game ID'].isin(self.game_ids)]
+        if new_rows.empty:
+            return
+        self.game_ids.update(new_rows['Game ID'])
+        self.frames.append(new_rows)
+        # Only the new rows are summed and added to the running totals
+        sums = new_rows.groupby(['Team', 'Home'])[STATS + OVER_COLUMNS].sum()
+        sums.insert(0, 'Games', new_rows.groupby(['Team', 'Home']).size())
+        self.totals = sums if self.totals is None else self.totals.add(sums, fill_value=0)
+        daily = new_rows.groupby(['Team', 'Date'])[['R', 'RA']].sum()
+        daily['Games'] = new_rows.groupby(['Team', 'Date']).size()
+        self.daily = daily if self.daily is None else self.daily.add(daily, fill_value=0)
+        self.update_rolling(new_rows['Date'].min(), new_rows['Date'].max())
+
+    def update_rolling(self, first_new_date, last_new_date):
+        '''Recomputes the rolling averages of the dates with new games in their window, leaving the rest as they were'''
+        # Only dates from first_new_date to one window after last_new_date have new games in their window. Their
+        # windows reach back at most the longest window, so only the daily sums from there are looked at.
+        longest = pd.Timedelta(days=max(self.windows) - 1)
+        dates = self.daily.index.get_level_values('Date')
+        recent = self.daily[(dates >= first_new_date - longest) & (dates <= last_new_date + longest)].reset_index()
+        recent = recent.sort_values(['Team', 'Date'], ignore_index=True)
+        for window in self.windows:
+            end = last_new_date + pd.Timedelta(days=window - 1)
+            # Time-based windows, so days off count towards the window the same as game days
+            # recent is sorted by team then date, so the rolled sums come out in the same order as its rows
+            sums = recent.groupby('Team').rolling(f'{window}D', on='Date')[['R', 'RA', 'Games']].sum()
+            keep = ((recent['Date'] >= first_new_date) & (recent['Date'] <= end)).to_numpy()
+            games = sums['Games'].to_numpy()[keep]
+            averages = pd.DataFrame({'Team': recent['Team'].to_numpy()[keep], 'Date': recent['Date'].to_numpy()[keep],
+                                     'Games': games.astype(np.int64), 'R': sums['R'].to_numpy()[keep] / games,
+                                     'RA': sums['RA'].to_numpy()[keep] / games})
+            previous = self.rolling_frames[window]
+            if previous is not None:
+                previous = previous[(previous['Date'] < first_new_date) | (previous['Date'] > end)]
+                averages = pd.concat([previous, averages], ignore_index=True)
+            self.rolling_frames[window] = averages.sort_values(['Team', 'Date'], kind='mergesort',
+                                                               ignore_index=True)
+
+    def team_games(self):
+        '''Returns every team-game row added so far'''
+        if not self.frames:
+            return team_games(pd.DataFrame())
+        return pd.concat(self.frames, ignore_index=True)
+
+    def splits(self):
+        '''Returns the games and average of every stat for each team at home, away and overall'''
+        if self.totals is None:
+            return pd.DataFrame(columns=['Team', 'Split', 'Games'] + STATS)
+        by_side = self.totals.rename(index={True: 'Home', False: 'Away'}, level='Home')
+        overall = self.totals.groupby(level='Team').sum()
+        overall.index = pd.MultiIndex.from_product([overall.index, ['All']])
+        totals = pd.concat([by_side, overall]).sort_index()
+        averages = totals[STATS].div(totals['Games'], axis=0)
+        averages.insert(0, 'Games', totals['Games'].astype(np.int64))
+        averages.index.names = ['Team', 'Split']
+        return averages.reset_index()
+
+    def over_rates(self):
+        '''Returns the share of each team's games that went over each total runs and first five innings line'''
+        if self.totals is None:
+            return pd.DataFrame(columns=['Team', 'Games'] + OVER_COLUMNS)
+        totals = self.totals.groupby(level='Team').sum()
+        rates = totals[OVER_COLUMNS].div(totals['Games'], axis=0)
+        rates.insert(0, 'Games', totals['Games'].astype(np.int64))
+        return rates.reset_index()
+
+    def rolling(self, window):
+        '''Returns each team's average runs scored and allowed per game over the last window days, for every date they played'''
+        averages = self.rolling_frames[window]
+        if averages is None:
+            return pd.DataFrame(columns=['Team', 'Date', 'Games', 'R', 'RA'])
+        return averages.copy()
+
+
+def stats_from_store(store, start, end):
+    '''Builds a TeamStats from the complete dates in a GameStore from start to end (datetime.dates, inclusive)'''
+    stats = TeamStats()
+    day = start
+    while day <= end:
+        all_games_df = store.load_scores(day)
+        if all_games_df is not None:
+            stats.add_scores(all_games_df)
+        day += datetime.timedelta(days=1)
+    return stats